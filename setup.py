@@ -9,4 +9,5 @@ setup(name="opcua-widgets",
       packages=["uawidgets"],
       license="GNU General Public License",
       install_requires=["asyncua"],
+      extras_require={"numpy": ["numpy"]},
       )
@@ -1,13 +1,147 @@
 
+import asyncio
+import copy
+import time
 import unittest
+from unittest import mock
 import sys
+from datetime import datetime, timedelta, timezone
 
 from asyncua import ua, Server
 from PyQt5 import Qt
-from PyQt5.QtWidgets import QApplication, QTreeView, QAbstractItemDelegate, QTableView
+from PyQt5.QtWidgets import QApplication, QTreeView, QAbstractItemDelegate, QTableView, QGraphicsView
+from PyQt5.QtCore import QModelIndex
 
-from uawidgets.attrs_widget import AttrsWidget
+from uawidgets.attrs_widget import AttrsWidget, AttributeData, MemberData, PENDING_COLOR, GOOD_COLOR
 from uawidgets.refs_widget import RefsWidget
+from uawidgets.node_cache import name_cache, method_signatures
+from uawidgets.call_method_dialog import CallMethodDialog, BatchCallDialog
+from uawidgets.compare_widget import CompareWidget, DIFF_COLOR
+from uawidgets.utils import write_nodes_attribute, percentile, LatencyStats, latency_histogram, Reservoir
+from uawidgets import array_utils
+from uawidgets.history_widget import HistoryColumns, HistoryWidget
+from uawidgets.trend_widget import decimate_min_max, RingBuffer
+from uawidgets.graph_widget import GraphWidget
+
+
+def parse_range(text):
+    parts = text.split(":")
+    return int(parts[0]), int(parts[-1]) + 1
+
+
+class IndexRangeNode(object):
+    """
+    wrap a node of the test server, which ignores IndexRange,
+    and apply IndexRange of Value reads and writes like a compliant server.
+    Read requests are recorded in reads
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.nodeid = node.nodeid
+        self.reads = []
+        self.writes = []
+
+    def __getattr__(self, name):
+        return getattr(self.node, name)
+
+    def _read(self, rv):
+        params = ua.ReadParameters()
+        params.NodesToRead.append(ua.ReadValueId(NodeId=rv.NodeId, AttributeId=rv.AttributeId))
+        dv = self.node.read_params(params)[0]
+        if not rv.IndexRange:
+            return dv
+        val = dv.Value.Value
+        start, stop = parse_range(rv.IndexRange)
+        if not isinstance(val, (list, bytes)):
+            return ua.DataValue(StatusCode=ua.StatusCode(ua.StatusCodes.BadIndexRangeInvalid))
+        if start >= len(val):
+            return ua.DataValue(StatusCode=ua.StatusCode(ua.StatusCodes.BadIndexRangeNoData))
+        return ua.DataValue(ua.Variant(val[start:stop], dv.Value.VariantType))
+
+    def read_params(self, params):
+        self.reads.append(params)
+        return [self._read(rv) for rv in params.NodesToRead]
+
+    def read_attributes(self, attrs):
+        params = ua.ReadParameters()
+        for attr in attrs:
+            params.NodesToRead.append(ua.ReadValueId(NodeId=self.nodeid, AttributeId=attr))
+        return self.read_params(params)
+
+    def write_params(self, params):
+        results = []
+        for wv in params.NodesToWrite:
+            self.writes.append(wv)
+            if not wv.IndexRange:
+                results.extend(self.node.write_params(ua.WriteParameters(NodesToWrite=[wv])))
+                continue
+            start, stop = parse_range(wv.IndexRange)
+            dv = self.node.read_attributes([wv.AttributeId])[0]
+            val = dv.Value.Value
+            new = bytearray(val) if isinstance(val, bytes) else list(val)
+            new[start:stop] = wv.Value.Value.Value
+            new = bytes(new) if isinstance(val, bytes) else new
+            self.node.write_value(ua.DataValue(ua.Variant(new, dv.Value.VariantType)))
+            results.append(ua.StatusCode())
+        return results
+
+
+class PagedSession(object):
+    """
+    wrap the session of the test server, which ignores RequestedMaxReferencesPerNode,
+    and return references page by page with continuation points like a compliant server
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.browse_next_count = 0
+        self._pages = {}
+        self._points = 0
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def _page(self, result, refs, size):
+        result.References = refs[:size]
+        result.ContinuationPoint = None
+        if len(refs) > size:
+            self._points += 1
+            result.ContinuationPoint = str(self._points).encode()
+            self._pages[result.ContinuationPoint] = (refs[size:], size)
+
+    async def browse(self, params):
+        results = await self.session.browse(params)
+        if params.RequestedMaxReferencesPerNode:
+            for result in results:
+                self._page(result, result.References, params.RequestedMaxReferencesPerNode)
+        return results
+
+    async def browse_next(self, params):
+        self.browse_next_count += 1
+        results = []
+        for point in params.ContinuationPoints:
+            refs, size = self._pages.pop(point)
+            result = ua.BrowseResult()
+            if not params.ReleaseContinuationPoints:
+                self._page(result, refs, size)
+            results.append(result)
+        return results
+
+
+class PagedNode(object):
+    """
+    node of the test server whose services are called through a PagedSession
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.nodeid = node.nodeid
+        self.aio_obj = copy.copy(node.aio_obj)
+        self.aio_obj.session = PagedSession(node.aio_obj.session)
+
+    def __getattr__(self, name):
+        return getattr(self.node, name)
 
 
 class TestRefsWidget(unittest.TestCase):
@@ -24,6 +158,477 @@ class TestRefsWidget(unittest.TestCase):
         o = self.server.nodes.objects
         self.widget.show_refs(o)
 
+    def test_filter(self):
+        o = self.server.nodes.objects
+        o.add_variable(1, "myvar_filter", 1.0)
+        self.widget.show_refs(o)
+        self.widget.set_filter(ua.ObjectIds.HierarchicalReferences, True, ua.BrowseDirection.Forward, ua.NodeClass.Variable)
+        names = [self.widget.model.index(row, 2).data() for row in range(self.widget.model.rowCount())]
+        self.assertEqual(names, ["1:myvar_filter"])
+
+    def test_browse_next(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "paged_folder")
+        for i in range(5):
+            folder.add_variable(1, "paged{}".format(i), 1.0)
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        self.widget.model.page_size = 2
+        folder = PagedNode(folder)
+        self.widget.show_refs(folder)
+        self.assertEqual(self.widget.model.rowCount(), 2)
+        counts = []
+        while self.widget.model.canFetchMore(QModelIndex()):
+            self.widget.model.fetchMore(QModelIndex())
+            counts.append(self.widget.model.rowCount())
+        self.assertEqual(counts, [4, 5])
+        self.assertEqual(folder.aio_obj.session.browse_next_count, 2)
+        names = [self.widget.model.index(row, 2).data() for row in range(5)]
+        self.assertEqual(sorted(names), ["1:paged{}".format(i) for i in range(5)])
+
+    def test_staged_edits(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "staged_folder")
+        v1 = folder.add_variable(1, "staged1", 1.0)
+        v2 = folder.add_variable(1, "staged2", 1.0)
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        self.widget.show_refs(folder)
+        self.widget.set_staging(True)
+        self.widget.view.selectAll()
+        self.widget.remove_ref()
+        self.assertEqual(self.widget.model.rowCount(), 0)
+        self.widget.add_ref()
+        ref = self.widget.model.refs[0]
+        old = copy.copy(ref)
+        ref.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+        ref.NodeId = v1.nodeid
+        ref.NodeClass = ua.NodeClass.Variable
+        self.widget.replace_ref(self.widget.model.index(0, 0), old, ref)
+        self.assertEqual(len(folder.get_children()), 2)
+        del_results, add_results = self.widget.commit_staged()
+        self.assertEqual(len(del_results), 2)
+        self.assertEqual(len(add_results), 1)
+        self.assertEqual(folder.get_children(refs=ua.ObjectIds.HasComponent), [v1])
+
+    def test_staged_edits_kept(self):
+        o = self.server.nodes.objects
+        folder1 = o.add_folder(1, "kept_folder1")
+        folder1.add_variable(1, "kept1", 1.0)
+        folder1.add_variable(1, "kept2", 1.0)
+        folder2 = o.add_folder(1, "kept_folder2")
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        counts = []
+        self.widget.staged_count_changed.connect(counts.append)
+        self.widget.show_refs(folder1)
+        self.widget.set_staging(True)
+        self.widget.view.setCurrentIndex(self.widget.model.index(0, 0))
+        self.widget.remove_ref()
+        self.widget.show_refs(folder2)
+        self.widget.show_refs(folder1)
+        self.assertEqual(self.widget.model.rowCount(), 1)
+        self.widget.reload()
+        self.assertEqual(self.widget.model.rowCount(), 1)
+        self.assertEqual(counts, [1])
+        self.widget.show_refs(folder2)
+        del_results, _ = self.widget.commit_staged()
+        self.assertEqual(len(del_results), 1)
+        self.assertEqual(counts, [1, 0])
+        self.assertEqual(len(folder1.get_children(refs=ua.ObjectIds.HasComponent)), 1)
+
+    def test_remove_unsaved_ref(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "unsaved_folder")
+        folder.add_variable(1, "unsaved1", 1.0)
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        self.widget.show_refs(folder)
+        errors = []
+        self.widget.error.connect(errors.append)
+        self.widget.add_ref()
+        self.assertEqual(self.widget.model.rowCount(), 2)
+        self.widget.view.setCurrentIndex(self.widget.model.index(1, 0))
+        self.widget.remove_ref()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.widget.model.rowCount(), 1)
+        self.assertEqual(len(folder.get_children(refs=ua.ObjectIds.HasComponent)), 1)
+
+    def wait_verification(self):
+        for _ in range(100):
+            if not self.widget._verify_timer.isActive():
+                break
+            time.sleep(0.01)
+            app.processEvents()
+
+    def test_delayed_verification(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "verified_folder")
+        var = o.add_variable(1, "verified_var", 1.0)
+        self.widget.verify_delay = 10
+        self.widget.set_filter(ua.ObjectIds.Organizes, False, ua.BrowseDirection.Forward)
+        self.widget.show_refs(folder)
+        self.widget.add_ref()
+        ref = self.widget.model.refs[0]
+        old = copy.copy(ref)
+        ref.ReferenceTypeId = ua.NodeId(ua.ObjectIds.Organizes)
+        ref.NodeId = var.nodeid
+        ref.IsForward = True
+        self.widget.replace_ref(self.widget.model.index(0, 0), old, ref)
+        self.assertTrue(self.widget._verify_timer.isActive())
+        self.assertIs(self.widget.model.refs[0], ref)
+        self.wait_verification()
+        # references were browsed again from the server
+        self.assertEqual(self.widget.model.rowCount(), 1)
+        self.assertIsNot(self.widget.model.refs[0], ref)
+        self.assertEqual(self.widget.model.refs[0].NodeId, var.nodeid)
+
+    def test_verification_with_staging(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "verified_staged_folder")
+        folder.add_variable(1, "verified_staged1", 1.0)
+        folder.add_variable(1, "verified_staged2", 1.0)
+        self.widget.verify_delay = 10
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        self.widget.show_refs(folder)
+        self.widget.view.setCurrentIndex(self.widget.model.index(0, 0))
+        self.widget.remove_ref()
+        self.assertTrue(self.widget._verify_timer.isActive())
+        self.widget.set_staging(True)
+        self.assertFalse(self.widget._verify_timer.isActive())
+        self.widget.view.setCurrentIndex(self.widget.model.index(0, 0))
+        self.widget.remove_ref()
+        self.assertEqual(self.widget.model.rowCount(), 0)
+        # verification after commit keeps the committed state
+        self.widget.set_staging(False)
+        self.assertTrue(self.widget._verify_timer.isActive())
+        self.wait_verification()
+        self.assertEqual(self.widget.model.rowCount(), 0)
+        self.assertEqual(folder.get_children(refs=ua.ObjectIds.HasComponent), [])
+
+    def test_target_details(self):
+        o = self.server.nodes.objects
+        folder = o.add_folder(1, "details_folder")
+        var = folder.add_variable(1, "details_var", 1.0)
+        self.widget.set_filter(ua.ObjectIds.HasComponent, False, ua.BrowseDirection.Forward)
+        self.widget.show_refs(folder)
+        self.assertEqual(self.widget.model.index(0, 4).data(), "details_var")
+        self.assertEqual(self.widget.model.index(0, 5).data(), "Variable")
+        self.assertEqual(name_cache.get_node_class(folder, var.nodeid), ua.NodeClass.Variable)
+
+
+class TestCompareWidget(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.server.set_endpoint("opc.tcp://0.0.0.0:48410/freeopcua/server/")
+        self.server.start()
+        self.widget = CompareWidget(QTableView())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_highlight_differences(self):
+        objects = self.server.nodes.objects
+        nodes = [objects.add_variable(1, "cmp{}".format(i), 1.0) for i in range(3)]
+        nodes.append(objects.add_variable(1, "cmp3", 2.0))
+        self.widget.show_nodes(nodes)
+        col = self.widget.attrs.index(ua.AttributeIds.Value)
+        self.assertEqual(self.widget.model.item(3, col).text(), "2.0")
+        self.assertEqual(self.widget.model.item(3, col).background().color(), DIFF_COLOR)
+        self.assertNotEqual(self.widget.model.item(0, col).background().color(), DIFF_COLOR)
+        self.assertNotEqual(self.widget.model.item(3, 0).background().color(), DIFF_COLOR)
+
+    def test_write_nodes_attribute(self):
+        objects = self.server.nodes.objects
+        nodes = [objects.add_variable(1, "bulk{}".format(i), 1.0) for i in range(3)]
+        dv = ua.DataValue(ua.Variant(ua.AccessLevel.CurrentRead.mask | ua.AccessLevel.CurrentWrite.mask, ua.VariantType.Byte))
+        results = write_nodes_attribute(objects, [n.nodeid for n in nodes + [objects]], ua.AttributeIds.AccessLevel, dv)
+        self.assertEqual([r.is_good() for r in results], [True, True, True, False])
+        self.assertEqual(nodes[2].read_attribute(ua.AttributeIds.AccessLevel).Value.Value, 3)
+
+
+class TestGraphWidget(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.server.set_endpoint("opc.tcp://0.0.0.0:48411/freeopcua/server/")
+        self.server.start()
+        self.widget = GraphWidget(QGraphicsView())
+
+    def tearDown(self):
+        self.widget.clear()
+        self.server.stop()
+
+    def test_crawl(self):
+        folder = self.server.nodes.objects.add_folder(1, "graph_folder")
+        for i in range(3):
+            obj = folder.add_object(1, "graph_obj{}".format(i))
+            obj.add_variable(1, "graph_var{}".format(i), 1.0)
+        finished = []
+        self.widget.finished.connect(lambda: finished.append(True))
+        self.widget.show_graph(folder, max_depth=2, max_concurrency=2)
+        start = time.time()
+        while not finished and time.time() - start < 10:
+            app.processEvents()
+        self.assertTrue(finished)
+        self.assertEqual(len(self.widget.items), 7)
+        self.assertEqual(len(self.widget.edges), 6)
+
+    def test_restart(self):
+        folder = self.server.nodes.objects.add_folder(1, "graph_restart")
+        folder.add_object(1, "graph_restart_obj")
+        finished = []
+        self.widget.finished.connect(lambda: finished.append(True))
+        self.widget.show_graph(folder)
+        # restarting cancels the first crawl without finishing it
+        self.widget.show_graph(folder)
+        start = time.time()
+        while not finished and time.time() - start < 10:
+            app.processEvents()
+        app.processEvents()
+        self.assertEqual(finished, [True])
+        self.assertEqual(self.widget.edges[0][1], ua.NodeId(ua.ObjectIds.Organizes))
+
+
+def double(parent, value):
+    return [ua.Variant(value.Value * 2, ua.VariantType.Int64)]
+
+
+async def slow(parent):
+    await asyncio.sleep(0.5)
+    return []
+
+
+class TestCallMethodDialog(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.server.set_endpoint("opc.tcp://0.0.0.0:48412/freeopcua/server/")
+        self.server.start()
+        self.objects = self.server.nodes.objects
+        self.method = self.objects.add_method(1, "double", double, [ua.VariantType.Int64], [ua.VariantType.Int64])
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_signature(self):
+        signature = method_signatures.get(self.method)
+        self.assertEqual(signature.parent, self.objects.nodeid)
+        self.assertEqual(signature.input_types, [ua.VariantType.Int64])
+        self.assertEqual(len(signature.outputs), 1)
+        self.assertIs(method_signatures.get(self.method), signature)
+
+    def test_signature_forgotten_after_write(self):
+        signature = method_signatures.get(self.method)
+        args = self.method.get_child("0:InputArguments")
+        self.assertEqual(signature.arguments[0], args.nodeid)
+        arg = ua.Argument(Name="factor", DataType=ua.NodeId(ua.ObjectIds.Double), ValueRank=-1)
+        widget = AttrsWidget(QTreeView())
+        widget.show_attrs(args)
+        widget.set_staging(True)
+        dv = ua.DataValue(ua.Variant([arg], ua.VariantType.ExtensionObject))
+        widget.stage_write(AttributeData(ua.AttributeIds.Value, [arg], ua.VariantType.ExtensionObject), dv, None)
+        widget.commit_staged()
+        signature = method_signatures.get(self.method)
+        self.assertEqual([arg.Name for arg in signature.inputs], ["factor"])
+        self.assertEqual(signature.input_types, [ua.VariantType.Double])
+
+    def test_call(self):
+        dialog = CallMethodDialog(None, self.server, self.method)
+        dialog.inputs[0].setText("21")
+        dialog.call()
+        self.wait_call(dialog)
+        self.assertEqual(dialog.outputs[0].text(), "42")
+
+    def wait_call(self, dialog):
+        start = time.time()
+        while dialog.method_call.running and time.time() - start < 10:
+            app.processEvents()
+        app.processEvents()
+
+    def test_call_timeout(self):
+        method = self.objects.add_method(1, "slow", slow, [], [])
+        dialog = CallMethodDialog(None, self.server, method)
+        dialog.timeout_spinbox.setValue(0.1)
+        dialog.call()
+        self.assertFalse(dialog.call_button.isEnabled())
+        self.wait_call(dialog)
+        self.assertIn("BadTimeout", dialog.result_label.text())
+        self.assertTrue(dialog.call_button.isEnabled())
+        dialog.timeout_spinbox.setValue(0)
+        dialog.call()
+        dialog.cancel_button.click()
+        self.wait_call(dialog)
+        self.assertIn("BadRequestCancelledByClient", dialog.result_label.text())
+
+    def test_load_test(self):
+        dialog = CallMethodDialog(None, self.server, self.method)
+        dialog.inputs[0].setText("1")
+        dialog.count_spinbox.setValue(50)
+        dialog.concurrency_spinbox.setValue(4)
+        dialog.toggle_load_test()
+        start = time.time()
+        while dialog.load_test.running and time.time() - start < 10:
+            app.processEvents()
+        self.assertEqual(dialog.load_test.count, 50)
+        self.assertEqual(dialog.load_test.statuses, {0: 50})
+        self.assertEqual(sum(count for _, count in dialog.load_test.latency_histogram.buckets()), 50)
+
+    def test_load_test_errors(self):
+        dialog = CallMethodDialog(None, self.server, self.method)
+        dialog.inputs[0].setText("1")
+        dialog.count_spinbox.setValue(10)
+        dialog.concurrency_spinbox.setValue(2)
+        with mock.patch.object(self.method.aio_obj.session, "call", side_effect=RuntimeError("lost")):
+            dialog.toggle_load_test()
+            start = time.time()
+            while dialog.load_test.running and time.time() - start < 10:
+                app.processEvents()
+        self.assertEqual(dialog.load_test.count, 10)
+        self.assertEqual(dialog.load_test.statuses, {ua.StatusCodes.Bad: 10})
+
+    def test_batch_call(self):
+        objects = [self.objects.add_object(1, "batch{}".format(i)) for i in range(3)]
+        dialog = BatchCallDialog(None, self.method, objects)
+        for row in range(3):
+            dialog.model.item(row, 1).setText(str(row))
+        dialog.add_call(ua.NodeId(999999, 1), ["1"])
+        dialog.call()
+        self.assertEqual([r.StatusCode.is_good() for r in dialog.results], [True, True, True, False])
+        self.assertEqual(dialog.model.item(2, 3).text(), "4")
+
+    def test_batch_call_signature_error(self):
+        objects = [self.objects.add_object(1, "batch_error{}".format(i)) for i in range(2)]
+        with mock.patch.object(method_signatures, "get", side_effect=RuntimeError("browse failed")):
+            dialog = BatchCallDialog(None, self.method, objects)
+        self.assertEqual(dialog.model.rowCount(), 2)
+        self.assertEqual(dialog.result_label.text(), "browse failed")
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertIsNone(percentile([], 50))
+
+    def test_latencies(self):
+        stats = LatencyStats(window=2)
+        now = datetime.now(timezone.utc)
+        for ms in (10, 20, 30):
+            dv = ua.DataValue(ua.Variant(1.0), SourceTimestamp=now - timedelta(milliseconds=ms), ServerTimestamp=now)
+            stats.add(dv, now + timedelta(milliseconds=5))
+        self.assertEqual(len(stats.source_server), 2)
+        self.assertAlmostEqual(stats.percentiles(stats.source_server, (50,))[0], 0.02, places=5)
+        self.assertAlmostEqual(stats.server_client[-1], 0.005, places=5)
+
+    def test_reservoir(self):
+        reservoir = Reservoir(size=10)
+        for val in range(1000):
+            reservoir.add(val)
+        self.assertEqual(reservoir.count, 1000)
+        self.assertEqual(len(reservoir.values), 10)
+        self.assertEqual(len(set(reservoir.values)), 10)
+
+    def test_latency_histogram(self):
+        buckets = latency_histogram([0.0005, 0.001, 0.003, 10.0], buckets=4)
+        self.assertEqual(buckets, [(0.001, 2), (0.002, 0), (0.004, 1), (None, 1)])
+
+
+@unittest.skipIf(array_utils.np is None, "numpy is not installed")
+class TestArrayUtils(unittest.TestCase):
+    def test_to_array(self):
+        arr = array_utils.to_array([1.0, float("nan"), 3.0], ua.VariantType.Float)
+        self.assertEqual(arr.dtype, array_utils.np.float32)
+        self.assertEqual(array_utils.format_range(arr, 2, 3), ["3.0"])
+        self.assertEqual(array_utils.array_summary(arr), "shape=(3,) dtype=float32 min=1.0 max=3.0 mean=2.0 nan=1")
+        self.assertEqual(array_utils.to_list(arr)[0], 1.0)
+
+    def test_to_array_ragged(self):
+        val = [[1, 2], [3]]
+        self.assertIs(array_utils.to_array(val, ua.VariantType.Int32), val)
+
+
+@unittest.skipIf(array_utils.np is None, "numpy is not installed")
+class TestTrendWidget(unittest.TestCase):
+    def test_decimate_min_max(self):
+        times = array_utils.np.arange(1000) * 0.01
+        values = array_utils.np.arange(1000) % 7
+        cols, mins, maxs = decimate_min_max(times, values, 0.0, 10.0, 100)
+        self.assertEqual(len(cols), 100)
+        self.assertEqual((mins[0], maxs[0]), (0, 6))
+        cols, mins, maxs = decimate_min_max(times, values, 9.0, 19.0, 100)
+        self.assertEqual(list(cols), list(range(10)))
+
+    def test_ring_buffer(self):
+        buf = RingBuffer(4)
+        for i in range(6):
+            buf.append(float(i), i * 10.0)
+        segments = buf.segments()
+        self.assertEqual([list(times) for times, _ in segments], [[2.0, 3.0], [4.0, 5.0]])
+        self.assertEqual([list(values) for _, values in segments], [[20.0, 30.0], [40.0, 50.0]])
+        # views of the buffer, not copies
+        self.assertTrue(all(times.base is buf.times for times, _ in segments))
+        self.assertFalse(buf.append(4.5, 0.0))
+        self.assertEqual(buf.dropped, 1)
+        self.assertEqual(len(buf), 4)
+
+
+class TestHistoryWidget(unittest.TestCase):
+    def setUp(self):
+        self.server = Server()
+        self.server.set_endpoint("opc.tcp://0.0.0.0:48413/freeopcua/server/")
+        self.server.start()
+        self.widget = HistoryWidget(QTableView())
+
+    def tearDown(self):
+        self.widget.clear()
+        self.server.stop()
+
+    @unittest.skipIf(array_utils.np is None, "numpy is not installed")
+    def test_history_columns(self):
+        columns = HistoryColumns(ua.VariantType.Int32)
+        columns.append([ua.DataValue(ua.Variant(i, ua.VariantType.Int32)) for i in range(1500)])
+        self.assertEqual(len(columns), 1500)
+        self.assertEqual(columns.values.dtype, array_utils.np.int32)
+        columns.append([ua.DataValue(StatusCode=ua.StatusCode(ua.StatusCodes.BadNoData))])
+        self.assertEqual(columns.values.dtype, object)
+        self.assertEqual(columns.value_to_string(1499), "1499")
+        self.assertEqual(columns.status(1500).name, "BadNoData")
+
+    def test_history_columns_none(self):
+        for vtype, val in ((ua.VariantType.Double, 1.5), (ua.VariantType.Boolean, True)):
+            columns = HistoryColumns(vtype)
+            columns.append([ua.DataValue(ua.Variant(val, vtype)), ua.DataValue(StatusCode=ua.StatusCode(ua.StatusCodes.BadNoData))])
+            self.assertEqual(columns.value_to_string(0), str(val))
+            self.assertEqual(columns.value_to_string(1), "None")
+
+    def test_history_columns_other_type(self):
+        for vtype, val, other in ((ua.VariantType.Int32, 1, ua.Variant(2.5, ua.VariantType.Double)),
+                                  (ua.VariantType.Boolean, True, ua.Variant(7, ua.VariantType.Int64))):
+            columns = HistoryColumns(vtype)
+            columns.append([ua.DataValue(ua.Variant(val, vtype)), ua.DataValue(other)])
+            self.assertEqual(columns.values.dtype, object)
+            self.assertEqual(columns.value_to_string(0), str(val))
+            self.assertEqual(columns.value_to_string(1), str(other.Value))
+
+    def test_paging(self):
+        myvar = self.server.nodes.objects.add_variable(1, "myvar_history", 0.0)
+        self.server.tloop.post(self.server.aio_obj.historize_node_data_change(myvar.aio_obj, period=None, count=0))
+        for i in range(1, 10):
+            myvar.write_value(float(i))
+            time.sleep(0.01)
+        for _ in range(100):
+            if len(myvar.read_raw_history()) == 10:
+                break
+            time.sleep(0.05)
+        # server returns continuation points when more than 3 values are asked for
+        self.server.aio_obj.iserver.history_manager.storage.max_history_data_response_size = 3
+        self.widget.show_history(myvar, datetime.now(timezone.utc) - timedelta(hours=1))
+        model = self.widget.model
+        self.assertEqual(model.rowCount(), 3)
+        pages = 1
+        while model.canFetchMore(QModelIndex()):
+            model.fetchMore(QModelIndex())
+            pages += 1
+        self.assertEqual(pages, 4)
+        self.assertEqual([model.index(row, 1).data() for row in range(model.rowCount())], [str(float(i)) for i in range(10)])
+
 
 class TestAttrsWidget(unittest.TestCase):
     def setUp(self):
@@ -116,8 +721,252 @@ class TestAttrsWidget(unittest.TestCase):
         self.modify_item("ValueRank", "ThreeDimensions")
         self.assertEqual(myvar.read_value_rank(), ua.ValueRank.ThreeDimensions)
 
+    def test_display_large_array(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myarray", [float(i) for i in range(5500)], ua.VariantType.Double)
+        self.widget.show_attrs(myvar)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.widget.view.expand(idx)
+        self.assertEqual(self.widget.model.rowCount(idx), 6)
+        chunk_idx = self.widget.model.index(5, 0, idx)
+        self.assertEqual(chunk_idx.data(), "[5000..5499]")
+        self.widget.view.expand(chunk_idx)
+        self.assertEqual(self.widget.model.rowCount(chunk_idx), 500)
+        self.assertEqual(self.widget.model.index(0, 1, chunk_idx).data(), "5000.0")
+
+    def test_value_read_count(self):
+        objects = self.server.nodes.objects
+        scalar = IndexRangeNode(objects.add_variable(1, "myvar_count", 9.99, ua.VariantType.Double))
+        self.widget.show_attrs(scalar)
+        # IndexRange of first read is rejected for a scalar
+        self.assertEqual(len(scalar.reads), 2)
+        scalar.reads = []
+        self.widget.show_attrs(scalar)
+        self.assertEqual(len(scalar.reads), 1)
+        array = IndexRangeNode(objects.add_variable(1, "myarray_count", [1, 2, 3], ua.VariantType.Int32))
+        self.widget.show_attrs(array)
+        self.assertEqual(len(array.reads), 1)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "[1, 2, 3]")
+
+    def test_large_value_read_on_demand(self):
+        objects = self.server.nodes.objects
+        array = IndexRangeNode(objects.add_variable(1, "myarray_on_demand", list(range(100)), ua.VariantType.Int32))
+        self.widget.max_value_bytes = 64
+        self.widget.show_attrs(array)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "100 elements, read on demand")
+
+    def test_edit_bytestring_element(self):
+        objects = self.server.nodes.objects
+        var = IndexRangeNode(objects.add_variable(1, "mybytes_on_demand", bytes(range(100)), ua.VariantType.ByteString))
+        self.widget.max_value_bytes = 64
+        self.widget.show_attrs(var)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "100 elements, read on demand")
+        self.widget.view.expand(idx)
+        self.modify_item("2", "55")
+        self.assertEqual(var.writes[-1].IndexRange, "2")
+        self.assertEqual(var.writes[-1].Value.Value.Value, b"\x37")
+        self.assertEqual(var.read_value()[:4], b"\x00\x01\x37\x03")
+        self.widget.set_staging(True)
+        self.modify_item("3", "66")
+        self.widget.commit_staged()
+        self.assertEqual(var.read_value()[:4], b"\x00\x01\x37\x42")
+
+    def test_edit_array_range(self):
+        objects = self.server.nodes.objects
+        var = IndexRangeNode(objects.add_variable(1, "myarray_range", list(range(10)), ua.VariantType.Int32))
+        self.widget.show_attrs(var)
+        self.modify_value("[0, 1, 20, 30, 4, 5, 6, 7, 8, 9]")
+        self.assertEqual(len(var.writes), 1)
+        self.assertEqual(var.writes[0].IndexRange, "2:3")
+        self.assertEqual(var.writes[0].Value.Value.Value, [20, 30])
+        self.assertEqual(var.read_value(), [0, 1, 20, 30, 4, 5, 6, 7, 8, 9])
+
+    def test_collapse_after_element_edit(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myarray_collapse", [1, 2, 3], ua.VariantType.Int32)
+        self.widget.show_attrs(myvar)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.widget.view.expand(idx)
+        self.modify_item("1", "5")
+        self.widget.view.expand(idx)
+        self.widget.view.collapse(idx)
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "[1, 5, 3]")
+        self.assertEqual(myvar.read_value(), [1, 5, 3])
+
+    @unittest.skipIf(array_utils.np is None, "numpy is not installed")
+    def test_array_summary_once(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myarray_summary", [float(i) for i in range(5500)], ua.VariantType.Double)
+        with mock.patch("uawidgets.attrs_widget.array_summary", wraps=array_utils.array_summary) as summary:
+            self.widget.show_attrs(myvar)
+            idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+            for _ in range(3):
+                self.widget.view.expand(idx)
+                self.widget.view.collapse(idx)
+        self.assertEqual(summary.call_count, 1)
+        self.assertTrue(idx.sibling(idx.row(), 1).data().startswith("shape=(5500,)"))
 
+    def test_lazy_children(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myarray_lazy", [1, 2, 3], ua.VariantType.Int32)
+        self.widget.show_attrs(myvar)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(self.widget.model.rowCount(idx), 0)
+        self.assertTrue(self.widget.model.hasChildren(idx))
+        self.assertTrue(self.widget.model.canFetchMore(idx))
+        self.widget.view.expand(idx)
+        self.assertEqual(self.widget.model.rowCount(idx), 3)
+        self.assertFalse(self.widget.model.canFetchMore(idx))
+        self.modify_item("2", "7")
+        self.assertEqual(myvar.read_value(), [1, 2, 7])
 
+    def test_edit_struct_member(self):
+        objects = self.server.nodes.objects
+        status = ua.ServerStatusDataType()
+        status.BuildInfo.ProductName = "product"
+        myvar = objects.add_variable(1, "mystruct_edit", ua.Variant(status, ua.VariantType.ExtensionObject))
+        self.widget.show_attrs(myvar)
+        idx = self.find_item("Value: ServerStatusDataType")
+        self.widget.view.expand(idx)
+        self.widget.view.expand(self.find_item("BuildInfo: BuildInfo"))
+        self.modify_item("ProductName", "first")
+        self.assertEqual(myvar.read_value().BuildInfo.ProductName, "first")
+        # fields of the structure classes were cached when they were displayed
+        with mock.patch("uawidgets.attrs_widget.fields", side_effect=AssertionError("fields of structure read again")):
+            self.widget.view.expand(idx)
+            self.widget.view.expand(self.find_item("BuildInfo: BuildInfo"))
+            self.modify_item("ProductName", "second")
+        self.assertEqual(myvar.read_value().BuildInfo.ProductName, "second")
+
+    def test_edit_member_of_large_array(self):
+        objects = self.server.nodes.objects
+        infos = [ua.BuildInfo(ProductName="product{}".format(i)) for i in range(40)]
+        var = IndexRangeNode(objects.add_variable(1, "mystructs_on_demand", ua.Variant(infos, ua.VariantType.ExtensionObject)))
+        self.widget.max_value_bytes = 64
+        self.widget.show_attrs(var)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "40 elements, read on demand")
+        self.widget.view.expand(idx)
+        self.widget.view.expand(self.find_item("2: BuildInfo"))
+        self.modify_item("ProductName", "edited")
+        self.assertEqual(var.writes[-1].IndexRange, "2")
+        values = var.read_value()
+        self.assertEqual([info.ProductName for info in values[1:4]], ["product1", "edited", "product3"])
+        # a failed write keeps displaying the value of the server
+        errors = []
+        self.widget.error.connect(errors.append)
+        self.widget.view.expand(idx)
+        self.widget.view.expand(self.find_item("2: BuildInfo"))
+        with mock.patch.object(var, "write_params", side_effect=RuntimeError("lost")):
+            self.modify_item("ProductName", "lost")
+        self.assertEqual(len(errors), 1)
+        member = self.find_item("ProductName")
+        self.assertEqual(member.sibling(member.row(), 1).data(), "edited")
+        self.assertEqual(var.read_value()[2].ProductName, "edited")
+
+    def test_empty_member_not_editable(self):
+        self.assertFalse(MemberData(None, "Value", None, ua.VariantType.Null).is_editable())
+
+    def test_data_type_name_cached(self):
+        objects = self.server.nodes.objects
+        double = self.server.get_node(ua.ObjectIds.Double)
+        dtype = double.add_data_type(1, "MyDouble")
+        myvar = IndexRangeNode(objects.add_variable(1, "myvar_custom_type", 9.99, ua.VariantType.Double, datatype=dtype.nodeid))
+        name_cache.clear()
+        self.widget.max_value_bytes = None
+        self.widget.show_attrs(myvar)
+        idx = self.find_item("DataType")
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "1:MyDouble")
+        # attributes and name of data type
+        self.assertEqual(len(myvar.reads), 2)
+        myvar.reads = []
+        self.widget.show_attrs(myvar)
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "1:MyDouble")
+        self.assertEqual(len(myvar.reads), 1)
+
+    def test_value_variant_type_cached(self):
+        objects = self.server.nodes.objects
+        double = self.server.get_node(ua.ObjectIds.Double)
+        dtype = double.add_data_type(1, "MyCachedDouble")
+        myvar = IndexRangeNode(objects.add_variable(1, "myvar_cached_type", 9.99, ua.VariantType.Double, datatype=dtype.nodeid))
+        self.widget.show_attrs(myvar)
+        myvar.reads = []
+        # VariantType was resolved from the DataType read when the node was displayed
+        with mock.patch.object(myvar.node, "read_data_type", side_effect=AssertionError("DataType read again")), \
+                mock.patch("uawidgets.attrs_widget.data_type_cache.get_variant_type", side_effect=AssertionError("DataType resolved again")):
+            self.modify_value("8.45")
+            self.modify_value("7.5")
+        self.assertEqual(myvar.reads, [])
+        self.assertEqual(myvar.read_value(), 7.5)
+
+    def test_reuse_rows(self):
+        objects = self.server.nodes.objects
+        var1 = objects.add_variable(1, "myvar_reuse1", 9.99, ua.VariantType.Double)
+        var2 = objects.add_variable(1, "myvar_reuse2", [1, 2], ua.VariantType.Int32)
+        self.widget.show_attrs(var1)
+        item = self.widget.model.item(0, 0)
+        self.widget.show_attrs(var2)
+        self.assertIs(self.widget.model.item(0, 0), item)
+        idx = self.find_item("BrowseName")
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "1:myvar_reuse2")
+        self.modify_value("[3, 4]")
+        self.assertEqual(var2.read_value(), [3, 4])
+
+    def test_staged_edits(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myvar_staged", 9.99, ua.VariantType.Double)
+        self.widget.show_attrs(myvar)
+        self.widget.set_staging(True)
+        self.modify_item("BrowseName", "1:staged")
+        self.modify_value("8.45")
+        self.assertEqual(myvar.read_value(), 9.99)
+        self.widget.commit_staged()
+        self.assertEqual(myvar.read_browse_name().to_string(), "1:staged")
+        self.assertEqual(myvar.read_value(), 8.45)
+
+    def test_staged_edits_kept_on_node_switch(self):
+        objects = self.server.nodes.objects
+        var1 = objects.add_variable(1, "myvar_kept1", 9.99, ua.VariantType.Double)
+        var2 = objects.add_variable(1, "myvar_kept2", [1, 2], ua.VariantType.Int32)
+        counts = []
+        self.widget.staged_count_changed.connect(counts.append)
+        self.widget.set_staging(True)
+        self.widget.show_attrs(var1)
+        self.modify_value("8.45")
+        self.widget.show_attrs(var2)
+        self.modify_item("BrowseName", "1:kept")
+        self.assertEqual(counts, [1, 2])
+        self.widget.show_attrs(var1)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(), "8.45")
+        self.assertEqual(idx.sibling(idx.row(), 1).data(Qt.BackgroundRole), PENDING_COLOR)
+        self.assertEqual(var1.read_value(), 9.99)
+        self.widget.commit_staged()
+        self.assertEqual(counts[-1], 0)
+        self.assertEqual(var1.read_value(), 8.45)
+        self.assertEqual(var2.read_browse_name().to_string(), "1:kept")
+        self.assertEqual(idx.sibling(idx.row(), 1).data(Qt.BackgroundRole), GOOD_COLOR)
+
+    def test_staged_edits_kept_on_write_error(self):
+        objects = self.server.nodes.objects
+        myvar = objects.add_variable(1, "myvar_staged_error", 9.99, ua.VariantType.Double)
+        self.widget.show_attrs(myvar)
+        self.widget.set_staging(True)
+        self.modify_value("8.45")
+        errors = []
+        self.widget.error.connect(errors.append)
+        with mock.patch.object(myvar, "write_params", side_effect=RuntimeError("connection lost")):
+            self.widget.commit_staged()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(self.widget.staged_count(), 1)
+        idx = self.widget.model.match(self.widget.model.index(0, 0), Qt.DisplayRole, "Value", 2, Qt.MatchExactly | Qt.MatchRecursive)[1]
+        self.assertEqual(idx.sibling(idx.row(), 1).data(Qt.BackgroundRole), PENDING_COLOR)
+        self.widget.commit_staged()
+        self.assertEqual(self.widget.staged_count(), 0)
+        self.assertEqual(myvar.read_value(), 8.45)
 
 
 if __name__ == "__main__":
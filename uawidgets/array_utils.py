@@ -0,0 +1,86 @@
+"""
+Helpers to handle large numeric array values as NumPy arrays.
+NumPy is optional, without it array values are kept as python lists
+"""
+import logging
+
+from asyncua import ua
+from asyncua.common.ua_utils import val_to_string
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+
+VARIANT_TO_DTYPE = {
+    ua.VariantType.Boolean: "bool",
+    ua.VariantType.SByte: "int8",
+    ua.VariantType.Byte: "uint8",
+    ua.VariantType.Int16: "int16",
+    ua.VariantType.UInt16: "uint16",
+    ua.VariantType.Int32: "int32",
+    ua.VariantType.UInt32: "uint32",
+    ua.VariantType.Int64: "int64",
+    ua.VariantType.UInt64: "uint64",
+    ua.VariantType.Float: "float32",
+    ua.VariantType.Double: "float64",
+}
+
+
+def is_ndarray(val):
+    return np is not None and isinstance(val, np.ndarray)
+
+
+def to_array(val, vtype):
+    """
+    return a list of numbers as a typed numpy array
+    val is returned unchanged if numpy is not available or val cannot be converted
+    """
+    if np is None or not isinstance(val, list) or vtype not in VARIANT_TO_DTYPE:
+        return val
+    try:
+        return np.array(val, dtype=VARIANT_TO_DTYPE[vtype])
+    except (ValueError, TypeError, OverflowError):
+        # ragged nested lists or values not matching the variant type
+        logger.info("Could not convert value of type %s to a numpy array", vtype)
+        return val
+
+
+def to_list(val):
+    """
+    convert numpy arrays back to python lists, for example before writing them
+    """
+    if is_ndarray(val):
+        return val.tolist()
+    return val
+
+
+def array_summary(arr):
+    """
+    return a short string describing shape, dtype and statistics of a numpy array
+    """
+    text = "shape={} dtype={}".format(arr.shape, arr.dtype)
+    if arr.size == 0:
+        return text
+    if arr.dtype.kind == "f":
+        nans = int(np.count_nonzero(np.isnan(arr)))
+        if nans == arr.size:
+            return "{} nan={}".format(text, nans)
+        return "{} min={} max={} mean={} nan={}".format(text, np.nanmin(arr), np.nanmax(arr), np.nanmean(arr), nans)
+    return "{} min={} max={} mean={}".format(text, arr.min(), arr.max(), arr.mean())
+
+
+def format_range(values, start, stop):
+    """
+    return the string representation of values[start:stop]
+    numpy arrays are formatted in one vectorized call
+    """
+    if is_ndarray(values):
+        if values.ndim == 1:
+            return values[start:stop].astype(str).tolist()
+        return [np.array2string(row, separator=", ", threshold=20) for row in values[start:stop]]
+    return [val_to_string(val) for val in values[start:stop]]
@@ -1,23 +1,46 @@
 import logging
 import functools
+from datetime import datetime, timezone
+from collections import namedtuple
 from enum import Enum
-from dataclasses import fields
+from dataclasses import fields, is_dataclass
 
-from PyQt5.QtCore import pyqtSignal, Qt, QObject, QSettings
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QSettings, QPersistentModelIndex
+from PyQt5.QtGui import QStandardItemModel, QStandardItem, QColor
 from PyQt5.QtWidgets import QApplication, QMenu, QAction, QStyledItemDelegate, QComboBox, QVBoxLayout, QCheckBox, QDialog, QAbstractItemView
 
 from asyncua import ua
 from asyncua.sync import new_node
-from asyncua.common.ua_utils import string_to_val, val_to_string, data_type_to_string
-from asyncua.ua.uatypes import type_string_from_type
+from asyncua.common.ua_utils import string_to_val, val_to_string
+from asyncua.ua.uatypes import type_string_from_type, type_is_list
 
+from uawidgets.array_utils import is_ndarray, to_array, to_list, array_summary, format_range
 from uawidgets.get_node_dialog import GetNodeButton
-from uawidgets.utils import trycatchslot
+from uawidgets.node_cache import name_cache, data_type_cache, method_signatures
+from uawidgets.index_range import IndexRangeArray, read_value_bounded, value_may_exceed, first_elements, write_range, range_variant, supports_index_range, index_range, changed_range, MAX_VALUE_BYTES, INDEX_RANGE_WRITE_REJECTED
+from uawidgets.utils import trycatchslot, LatencyStats
 
 
 logger = logging.getLogger(__name__)
 
+# lists longer than this are displayed as chunks of at most LIST_CHUNK_SIZE rows
+# whose children are only created when the user expands them
+LIST_CHUNK_SIZE = 1000
+
+# background of edited items when staging edits
+PENDING_COLOR = QColor(255, 240, 160)
+GOOD_COLOR = QColor(200, 240, 200)
+BAD_COLOR = QColor(255, 190, 190)
+
+# attributes edited bit by bit with a BitEditor
+BITFIELD_ATTRIBUTES = (
+    ua.AttributeIds.AccessLevel,
+    ua.AttributeIds.UserAccessLevel,
+    ua.AttributeIds.WriteMask,
+    ua.AttributeIds.UserWriteMask,
+    ua.AttributeIds.EventNotifier,
+)
+
 
 def robust(func):
     @functools.wraps(func)
@@ -60,7 +83,20 @@ class BitEditor(QDialog):
 
 
 class _Data(object):
+    # False if children of the row have not been created yet
+    fetched = True
+    # value and its text, summaries of large arrays are computed once
+    _text = None
+
+    def to_string(self):
+        if self._text is None or self._text[0] is not self.value:
+            self._text = (self.value, value_to_string(self.value))
+        return self._text[1]
+
     def is_editable(self):
+        if (isinstance(self.value, list) and len(self.value) > LIST_CHUNK_SIZE) or is_ndarray(self.value) or isinstance(self.value, IndexRangeArray):
+            # displayed text is truncated or a summary, we cannot parse it back
+            return False
         if self.uatype != ua.VariantType.ExtensionObject:
             return True
         return False
@@ -80,6 +116,12 @@ class MemberData(_Data):
         self.value = value
         self.uatype = uatype
 
+    def is_editable(self):
+        if self.obj is None:
+            # placeholder of an empty value, there is no structure to set the member in
+            return False
+        return _Data.is_editable(self)
+
 
 class ListData(_Data):
     def __init__(self, mylist, idx, val, uatype):
@@ -89,27 +131,100 @@ class ListData(_Data):
         self.uatype = uatype
 
 
+class ListChunkData(_Data):
+    """
+    A range of a large list, elements are displayed when the row is expanded
+    """
+
+    def __init__(self, mylist, start, stop, uatype):
+        self.mylist = mylist
+        self.start = start
+        self.stop = stop
+        self.value = None
+        self.uatype = uatype
+        self.fetched = False
+
+    def is_editable(self):
+        return False
+
+
+class AttrsModel(QStandardItemModel):
+    """
+    Model calling fetcher to create children of rows whose data is
+    not fetched yet, the first time they are expanded
+    """
+
+    def __init__(self, fetcher):
+        QStandardItemModel.__init__(self)
+        self._fetcher = fetcher
+
+    def _unfetched_data(self, idx):
+        if not idx.isValid():
+            return None
+        data = self.data(idx.sibling(idx.row(), 1), Qt.UserRole)
+        if isinstance(data, _Data) and not data.fetched:
+            return data
+        return None
+
+    def hasChildren(self, idx):
+        if self._unfetched_data(idx) is not None:
+            return True
+        return QStandardItemModel.hasChildren(self, idx)
+
+    def canFetchMore(self, idx):
+        return self._unfetched_data(idx) is not None
+
+    def fetchMore(self, idx):
+        data = self._unfetched_data(idx)
+        if data is None:
+            return
+        data.fetched = True
+        self._fetcher(self.itemFromIndex(idx.sibling(idx.row(), 0)), data)
+
+
 class AttrsWidget(QObject):
 
     error = pyqtSignal(Exception)
     attr_written = pyqtSignal(ua.AttributeIds, ua.DataValue)
+    # number of staged edits of all nodes
+    staged_count_changed = pyqtSignal(int)
 
-    def __init__(self, view, show_timestamps=True):
+    def __init__(self, view, show_timestamps=True, max_value_bytes=MAX_VALUE_BYTES):
         QObject.__init__(self, view)
         self.view = view
         self._timestamps = show_timestamps
+        # array values larger than this are read on demand using IndexRange, None to always read everything
+        self.max_value_bytes = max_value_bytes
         delegate = MyDelegate(self.view, self)
         delegate.error.connect(self.error.emit)
         delegate.attr_written.connect(self.attr_written.emit)
         self.settings = QSettings()
+        # for each node, True if server writes only the IndexRange of array values
+        self.index_range_support = {}
+        # for each node, False if its rank and data type show its value is always read completely
+        self.large_values = {}
+        # when staging, edits are collected and written in one request by commit_staged()
+        self.staging = False
+        self._staged = {}
+        # staged edits of other nodes, kept until committed or discarded
+        self._stashed = {}
         self.view.setItemDelegate(delegate)
-        self.model = QStandardItemModel()
+        self.attr_written.connect(self._attr_written)
+        self.model = AttrsModel(self._fetch_children)
         self.model.setHorizontalHeaderLabels(['Attribute', 'Value', 'DataType'])
         state = self.settings.value("WindowState/attrs_widget_state", None)
         if state is not None:
             self.view.header().restoreState(state)
         self.view.setModel(self.model)
         self.current_node = None
+        # VariantType of the Value attribute, resolved from DataType when node is shown
+        self.value_variant_type = None
+        # latencies of values of current node, fed by add_value_sample when subscribed
+        self.latency_stats = LatencyStats()
+        self._value_received = None
+        self._latency_items = None
+        # NodeClass and attribute of each top level row, rows are reused for nodes with same attributes
+        self._skeleton = None
         self.view.header().setSectionResizeMode(0)
         self.view.header().setStretchLastSection(True)
         self.view.expanded.connect(self._item_expanded)
@@ -121,8 +236,21 @@ class AttrsWidget(QObject):
         self.view.customContextMenuRequested.connect(self.showContextMenu)
         copyaction = QAction("&Copy Value", self.model)
         copyaction.triggered.connect(self._copy_value)
+        self.stageAction = QAction("Stage Edits", self.model)
+        self.stageAction.setCheckable(True)
+        self.stageAction.toggled.connect(self.set_staging)
+        self.commitAction = QAction("Commit Staged Edits", self.model)
+        self.commitAction.triggered.connect(self.commit_staged)
+        self.discardAction = QAction("Discard Staged Edits", self.model)
+        self.discardAction.triggered.connect(self.discard_staged)
+        self.commitAction.setEnabled(False)
+        self.discardAction.setEnabled(False)
         self._contextMenu = QMenu()
         self._contextMenu.addAction(copyaction)
+        self._contextMenu.addSeparator()
+        self._contextMenu.addAction(self.stageAction)
+        self._contextMenu.addAction(self.commitAction)
+        self._contextMenu.addAction(self.discardAction)
 
     def save_state(self):
         self.settings.setValue("WindowState/attrs_widget_state", self.view.header().saveState())
@@ -132,13 +260,15 @@ class AttrsWidget(QObject):
             # only for value attributes which a re childs
             # maybe add more tests
             return
-        it = self.model.itemFromIndex(idx.sibling(0, 1))
+        it = self.model.itemFromIndex(idx.sibling(idx.row(), 1))
         it.setText("")
 
     def _item_collapsed(self, idx):
-        it = self.model.itemFromIndex(idx.sibling(0, 1))
+        it = self.model.itemFromIndex(idx.sibling(idx.row(), 1))
         data = it.data(Qt.UserRole)
-        it.setText(val_to_string(data.value))
+        if not isinstance(data, _Data) or isinstance(data, ListChunkData):
+            return
+        it.setText(data.to_string())
 
     def showContextMenu(self, position):
         item = self.get_current_item()
@@ -157,55 +287,322 @@ class AttrsWidget(QObject):
 
     def clear(self):
         # remove all rows but not header!!
+        self._latency_items = None
+        self._skeleton = None
         self.model.removeRows(0, self.model.rowCount())
 
     def reload(self):
         self.show_attrs(self.current_node)
 
     def show_attrs(self, node):
+        if self._staged:
+            # rows of staged edits are recreated, they are marked again when node is shown
+            logger.info("Keeping %s staged edits of node %s", len(self._staged), self.current_node)
+            staged = {key: (wv, data, []) for key, (wv, data, _) in self._staged.items()}
+            self._stashed[self.current_node.nodeid] = (self.current_node, staged)
+            self._staged = {}
+        if node is None or self.current_node is None or node.nodeid != self.current_node.nodeid:
+            self.latency_stats = LatencyStats()
         self.current_node = node
-        self.clear()
+        self.value_variant_type = None
         if self.current_node:
+            self._staged = self._stashed.pop(node.nodeid, (None, {}))[1]
             self._show_attrs()
+            self._mark_staged()
+        else:
+            self.clear()
         self.view.expandToDepth(0)
 
+    def _apply_staged(self, attrs):
+        """
+        show staged values of current node instead of values read from server
+        """
+        values = {}
+        for (attr, indexrange), (wv, data, _) in self._staged.items():
+            if indexrange is None:
+                values[attr] = wv.Value
+            elif attr not in values and not isinstance(data.value, IndexRangeArray):
+                # staged elements were set in the complete value we displayed
+                values[attr] = ua.DataValue(ua.Variant(to_list(data.value), data.uatype))
+        return [(attr, values.get(attr, dv)) for attr, dv in attrs]
+
+    def _mark_staged(self):
+        for (attr, indexrange), (_, _, idxs) in self._staged.items():
+            item = self._find_attr_item(attr)
+            if item is None:
+                continue
+            self.model.setData(item.index(), PENDING_COLOR, Qt.BackgroundRole)
+            if indexrange is not None:
+                self.model.setData(item.index(), "Staged IndexRange " + indexrange, Qt.ToolTipRole)
+            idxs.append(QPersistentModelIndex(item.index()))
+
+    def _find_attr_item(self, attr):
+        """
+        return the item showing the value of attribute attr
+        """
+        for row in range(self.model.rowCount()):
+            item = self.model.item(row, 1)
+            if item.data(Qt.UserRole) is None and self.model.item(row, 0).child(0, 1) is not None:
+                # value is shown in the first child row
+                item = self.model.item(row, 0).child(0, 1)
+            data = item.data(Qt.UserRole)
+            if isinstance(data, AttributeData) and data.attr == attr:
+                return item
+        return None
+
+    def staged_count(self):
+        """
+        number of staged edits of all nodes
+        """
+        return len(self._staged) + sum(len(staged) for _, staged in self._stashed.values())
+
+    def _staged_changed(self):
+        count = self.staged_count()
+        self.commitAction.setText("Commit Staged Edits ({})".format(count) if count else "Commit Staged Edits")
+        self.commitAction.setEnabled(bool(count))
+        self.discardAction.setEnabled(bool(count))
+        self.staged_count_changed.emit(count)
+
+    def set_staging(self, staging):
+        self.staging = staging
+        self.stageAction.setChecked(staging)
+        if not staging and self.staged_count():
+            self.commit_staged()
+
+    def has_staged(self, attr, indexrange=None):
+        return (attr, indexrange) in self._staged
+
+    def stage_write(self, data, dv, idx, indexrange=None):
+        """
+        stage writing dv to attribute of data, idx is the edited item
+        a later edit of the same attribute and IndexRange replaces the staged one
+        """
+        wv = ua.WriteValue()
+        wv.NodeId = self.current_node.nodeid
+        wv.AttributeId = data.attr
+        wv.IndexRange = indexrange
+        wv.Value = dv
+        key = (data.attr, indexrange)
+        if key in self._staged:
+            idxs = self._staged[key][2]
+        else:
+            idxs = []
+        if idx is not None:
+            idxs.append(QPersistentModelIndex(idx))
+            self.model.setData(idx, PENDING_COLOR, Qt.BackgroundRole)
+        self._staged[key] = (wv, data, idxs)
+        if data.attr == ua.AttributeIds.DataType:
+            # staged values must be encoded with the staged data type
+            self._set_value_data_type(dv.Value.Value)
+        logger.info("Staged write of %s with IndexRange %s: %s", data.attr, indexrange, dv)
+        self._staged_changed()
+
+    @trycatchslot
+    def commit_staged(self):
+        """
+        write staged edits of all nodes in one Write request
+        """
+        staged = [(self.current_node, entry) for entry in self._staged.values()]
+        for node, entries in self._stashed.values():
+            staged.extend((node, entry) for entry in entries.values())
+        if not staged:
+            return
+        client_node = staged[0][0]
+        params = ua.WriteParameters()
+        params.NodesToWrite = [wv for _, (wv, _, _) in staged]
+        logger.info("Writing %s staged edits", len(staged))
+        # edits stay staged, and can be committed again, if the request fails
+        results = client_node.write_params(params)
+        self._staged = {}
+        self._stashed = {}
+        self._staged_changed()
+        retry = []
+        for (node, (wv, data, idxs)), status in zip(staged, results):
+            if wv.IndexRange and status.value in INDEX_RANGE_WRITE_REJECTED and not isinstance(data.value, IndexRangeArray):
+                # server does not support writing a range, write complete value instead
+                self.index_range_support[node.nodeid] = False
+                full = ua.WriteValue()
+                full.NodeId = wv.NodeId
+                full.AttributeId = wv.AttributeId
+                full.Value = ua.DataValue(ua.Variant(to_list(data.value), data.uatype))
+                retry.append((node, (full, data, idxs)))
+            else:
+                self._show_write_result(node, wv, idxs, status)
+        if retry:
+            params.NodesToWrite = [wv for _, (wv, _, _) in retry]
+            results = client_node.write_params(params)
+            for (node, (wv, data, idxs)), status in zip(retry, results):
+                self._show_write_result(node, wv, idxs, status)
+
+    def _show_write_result(self, node, wv, idxs, status):
+        if self.current_node is None or node.nodeid != self.current_node.nodeid:
+            # rows of other nodes are not shown
+            if status.is_good():
+                self._forget_cached(node, wv.AttributeId)
+            else:
+                logger.warning("Writing %s of node %s with IndexRange %s failed: %s", wv.AttributeId, node, wv.IndexRange, status)
+                self.error.emit(ua.UaStatusCodeError(status.value))
+            return
+        color = GOOD_COLOR if status.is_good() else BAD_COLOR
+        for pidx in idxs:
+            if pidx.isValid():
+                idx = self.model.index(pidx.row(), pidx.column(), pidx.parent())
+                self.model.setData(idx, color, Qt.BackgroundRole)
+                self.model.setData(idx, status.name, Qt.ToolTipRole)
+        if status.is_good():
+            self.attr_written.emit(wv.AttributeId, wv.Value)
+        else:
+            logger.warning("Writing %s with IndexRange %s failed: %s", wv.AttributeId, wv.IndexRange, status)
+
+    @trycatchslot
+    def discard_staged(self):
+        """
+        forget staged edits of all nodes and show values from server again
+        """
+        self._staged = {}
+        self._stashed = {}
+        self._staged_changed()
+        self.reload()
+
+    def _attr_written(self, attr, dv):
+        if attr == ua.AttributeIds.DataType:
+            self._set_value_data_type(dv.Value.Value)
+        self._forget_cached(self.current_node, attr)
+
+    def _forget_cached(self, node, attr):
+        # caches of node which depend on a written attribute
+        if attr in (ua.AttributeIds.BrowseName, ua.AttributeIds.DisplayName):
+            name_cache.forget(node, node.nodeid)
+        elif attr in (ua.AttributeIds.DataType, ua.AttributeIds.ValueRank, ua.AttributeIds.ArrayDimensions):
+            self.large_values.pop(node.nodeid, None)
+        elif attr == ua.AttributeIds.Value:
+            # node may be the InputArguments or OutputArguments of a method
+            method_signatures.forget_arguments(node, node.nodeid)
+
+    def _set_value_data_type(self, dtype):
+        try:
+            self.value_variant_type = data_type_cache.get_variant_type(self.current_node, dtype)
+        except Exception:
+            logger.exception("Could not get VariantType of data type %s of node %s", dtype, self.current_node)
+            self.value_variant_type = None
+
+    def get_value_variant_type(self):
+        """
+        return the VariantType to use when writing the Value attribute
+        """
+        if self.value_variant_type is None:
+            self.value_variant_type = data_type_cache.get_variant_type(self.current_node, self.current_node.read_data_type())
+        return self.value_variant_type
+
     def _show_attrs(self):
-        attrs = self.get_all_attrs()
+        try:
+            attrs = self.get_all_attrs()
+        except Exception:
+            self.clear()
+            raise
+        attrs = self._apply_staged(attrs)
+        # resolve names of all nodeids we display in one request
+        name_cache.prefetch(self.current_node, [dv.Value.Value for attr, dv in attrs if attr == ua.AttributeIds.DataType])
+        nclass = None
+        for attr, dv in attrs:
+            if attr == ua.AttributeIds.DataType and dv.StatusCode.is_good():
+                self._set_value_data_type(dv.Value.Value)
+            elif attr == ua.AttributeIds.NodeClass:
+                nclass = dv.Value.Value
+        # DataTypeDefinition is not shown when empty
+        attrs = [(attr, dv) for attr, dv in attrs if attr != ua.AttributeIds.DataTypeDefinition or dv.Value.Value is not None]
+        skeleton = (nclass, [attr for attr, _ in attrs])
+        if skeleton == self._skeleton:
+            self._update_attrs(attrs)
+            return
+        self.clear()
+        shown = []
         for attr, dv in attrs:
             try:
                 # try/except to show as many attributes as possible
-                if attr == ua.AttributeIds.Value:
-                    self._show_value_attr(attr, dv)
-                elif attr == ua.AttributeIds.DataTypeDefinition:
-                    self._show_sdef_attr(attr, dv)
-                else:
-                    self._show_attr(attr, dv)
+                self._show_attr_row(attr, dv)
+                shown.append(attr)
             except Exception as ex:
                 logger.exception("Exception while displaying attribute %s with value %s for node %s", attr, dv, self.current_node)
                 self.error.emit(ex)
+        if self.model.rowCount() == len(shown):
+            self._skeleton = (nclass, shown)
 
-    def _show_attr(self, attr, dv):
-        if attr == ua.AttributeIds.DataType:
-            # FIXME: Could query for browsename here, it does not cost much
-            string = data_type_to_string(dv.Value.Value)
-        elif attr in (ua.AttributeIds.AccessLevel,
-                      ua.AttributeIds.UserAccessLevel,
-                      ua.AttributeIds.WriteMask,
-                      ua.AttributeIds.UserWriteMask,
-                      ua.AttributeIds.EventNotifier):
-            string = enum_to_string(attr, dv.Value.Value)
+    def _show_attr_row(self, attr, dv):
+        if attr == ua.AttributeIds.Value:
+            self._show_value_attr(attr, dv)
+        elif attr == ua.AttributeIds.DataTypeDefinition:
+            self._show_sdef_attr(attr, dv)
         else:
-            string = val_to_string(dv.Value.Value)
+            self._show_attr(attr, dv)
+
+    def _update_attrs(self, attrs):
+        """
+        reuse rows of previous node having the same attributes,
+        simple attributes are updated without signals followed by one dataChanged,
+        rows of Value and DataTypeDefinition are recreated
+        """
+        self.model.blockSignals(True)
+        try:
+            for row, (attr, dv) in enumerate(attrs):
+                if attr not in (ua.AttributeIds.Value, ua.AttributeIds.DataTypeDefinition):
+                    self._update_attr(row, attr, dv)
+        finally:
+            self.model.blockSignals(False)
+        self.model.dataChanged.emit(self.model.index(0, 0), self.model.index(self.model.rowCount() - 1, 2))
+        for row, (attr, dv) in enumerate(attrs):
+            if attr in (ua.AttributeIds.Value, ua.AttributeIds.DataTypeDefinition):
+                self.model.removeRow(row)
+                try:
+                    self._show_attr_row(attr, dv)
+                    items = self.model.takeRow(self.model.rowCount() - 1)
+                except Exception as ex:
+                    logger.exception("Exception while displaying attribute %s with value %s for node %s", attr, dv, self.current_node)
+                    self.error.emit(ex)
+                    # keep other rows in place, next node will rebuild everything
+                    items = [QStandardItem(attr.name), QStandardItem(), QStandardItem()]
+                    self._skeleton = None
+                self.model.insertRow(row, items)
+
+    def _update_attr(self, row, attr, dv):
+        vitem = self.model.item(row, 1)
+        try:
+            vitem.setText(self._attr_to_string(attr, dv))
+        except Exception as ex:
+            logger.exception("Exception while displaying attribute %s with value %s for node %s", attr, dv, self.current_node)
+            self.error.emit(ex)
+            vitem.setText("")
+        vitem.setData(AttributeData(attr, dv.Value.Value, dv.Value.VariantType), Qt.UserRole)
+        # remove colors of staged edits of previous node
+        vitem.setData(None, Qt.BackgroundRole)
+        vitem.setData(None, Qt.ToolTipRole)
+        self.model.item(row, 2).setText(dv.Value.VariantType.name)
+
+    def _attr_to_string(self, attr, dv):
+        if attr == ua.AttributeIds.DataType:
+            return name_cache.get_browse_name(self.current_node, dv.Value.Value)
+        elif attr in BITFIELD_ATTRIBUTES:
+            return enum_to_string(attr, dv.Value.Value)
+        return value_to_string(dv.Value.Value)
+
+    def _show_attr(self, attr, dv):
         name_item = QStandardItem(attr.name)
-        vitem = QStandardItem(string)
+        vitem = QStandardItem(self._attr_to_string(attr, dv))
         vitem.setData(AttributeData(attr, dv.Value.Value, dv.Value.VariantType), Qt.UserRole)
         self.model.appendRow([name_item, vitem, QStandardItem(dv.Value.VariantType.name)])
 
     def _show_value_attr(self, attr, dv):
         name_item = QStandardItem("Value")
         vitem = QStandardItem()
-        items = self._show_val(name_item, None, "Value", dv.Value.Value, dv.Value.VariantType)
-        items[1].setData(AttributeData(attr, dv.Value.Value, dv.Value.VariantType), Qt.UserRole)
+        value = dv.Value.Value
+        if isinstance(value, list) and len(value) > LIST_CHUNK_SIZE:
+            # large numeric arrays are kept as numpy arrays if available
+            value = to_array(value, dv.Value.VariantType)
+        items = self._show_val(name_item, None, "Value", value, dv.Value.VariantType)
+        data = AttributeData(attr, value, dv.Value.VariantType)
+        data.fetched = items[1].data(Qt.UserRole).fetched
+        data._text = items[1].data(Qt.UserRole)._text
+        items[1].setData(data, Qt.UserRole)
         row = [name_item, vitem, QStandardItem(dv.Value.VariantType.name)]
         self.model.appendRow(row)
         self._show_timestamps(name_item, dv)
@@ -214,58 +611,93 @@ class AttrsWidget(QObject):
         if dv.Value.Value is None:
             return
         items = self._show_val(self.model, None, "DataTypeDefinition", dv.Value.Value, dv.Value.VariantType)
-        items[1].setData(AttributeData(attr, dv.Value.Value, dv.Value.VariantType), Qt.UserRole)
+        data = AttributeData(attr, dv.Value.Value, dv.Value.VariantType)
+        data.fetched = items[1].data(Qt.UserRole).fetched
+        items[1].setData(data, Qt.UserRole)
 
     @robust
     def _show_val(self, parent, obj, name, val, vtype):
         name_item = QStandardItem(name)
         vitem = QStandardItem()
-        vitem.setText(val_to_string(val))
-        vitem.setData(MemberData(obj, name, val, vtype), Qt.UserRole)
+        data = MemberData(obj, name, val, vtype)
+        vitem.setText(data.to_string())
         row = [name_item, vitem, QStandardItem(str(vtype))]
-        # if we have a list or extension object we display children
-        if isinstance(val, list):
+        # children of lists and extension objects are created when the row is expanded
+        if is_list(val):
             row[2].setText("List of " + str(vtype))
-            self._show_list(name_item, val, vtype)
-        elif vtype == ua.VariantType.ExtensionObject:
-            self._show_ext_obj(name_item, val)
+            data.fetched = len(val) == 0
+        elif has_fields(val, vtype):
+            name_item.setText(name + ": " + val.__class__.__name__)
+            data.fetched = False
+        vitem.setData(data, Qt.UserRole)
         parent.appendRow(row)
         return row
 
     @robust
     def _show_list(self, parent, mylist, vtype):
-        for idx, val in enumerate(mylist):
+        if len(mylist) > LIST_CHUNK_SIZE:
+            self._show_list_chunks(parent, mylist, 0, len(mylist), vtype)
+        else:
+            self._show_list_range(parent, mylist, 0, len(mylist), vtype)
+
+    def _show_list_range(self, parent, mylist, start, stop, vtype):
+        vtypename = vtype.name if isinstance(vtype, Enum) else str(vtype)
+        # slice once, elements of IndexRangeArray are read from server when accessed
+        values = mylist[start:stop]
+        texts = format_range(values, 0, len(values))
+        for idx in range(start, stop):
+            val = values[idx - start]
             name_item = QStandardItem(str(idx))
             vitem = QStandardItem()
-            vitem.setText(val_to_string(val))
-            vitem.setData(ListData(mylist, idx, val, vtype), Qt.UserRole)
-            vtypename = vtype.name if isinstance(vtype, Enum) else str(vtype)
-            row = [name_item, vitem, QStandardItem(vtypename)]
-            parent.appendRow(row)
-            if vtype == ua.VariantType.ExtensionObject or not isinstance(vtype, ua.VariantType):
-                self._show_ext_obj(name_item, val)
+            vitem.setText(texts[idx - start])
+            data = ListData(mylist, idx, val, vtype)
+            if has_fields(val, vtype):
+                name_item.setText(name_item.text() + ": " + val.__class__.__name__)
+                data.fetched = False
+            vitem.setData(data, Qt.UserRole)
+            parent.appendRow([name_item, vitem, QStandardItem(vtypename)])
+
+    def _show_list_chunks(self, parent, mylist, start, stop, vtype):
+        # never show more than LIST_CHUNK_SIZE chunks, chunks too large are split again when expanded
+        span = LIST_CHUNK_SIZE
+        while stop - start > span * LIST_CHUNK_SIZE:
+            span *= LIST_CHUNK_SIZE
+        vtypename = vtype.name if isinstance(vtype, Enum) else str(vtype)
+        for chunk_start in range(start, stop, span):
+            chunk_stop = min(chunk_start + span, stop)
+            name_item = QStandardItem("[{}..{}]".format(chunk_start, chunk_stop - 1))
+            vitem = QStandardItem()
+            vitem.setData(ListChunkData(mylist, chunk_start, chunk_stop, vtype), Qt.UserRole)
+            parent.appendRow([name_item, vitem, QStandardItem(vtypename)])
+
+    @robust
+    def _fetch_children(self, item, data):
+        if isinstance(data, ListChunkData):
+            if data.stop - data.start > LIST_CHUNK_SIZE:
+                self._show_list_chunks(item, data.mylist, data.start, data.stop, data.uatype)
+            else:
+                self._show_list_range(item, data.mylist, data.start, data.stop, data.uatype)
+        elif is_list(data.value):
+            self._show_list(item, data.value, data.uatype)
+        else:
+            self._show_ext_obj(item, data.value)
 
     def refresh_list(self, parent, mylist, vtype):
+        data = self.model.data(parent.index().siblingAtColumn(1), Qt.UserRole)
+        if isinstance(data, _Data) and not data.fetched:
+            # children will be created from the new value when expanded
+            return
         while parent.hasChildren():
             self.model.removeRow(0, parent.index())
         self._show_list(parent, mylist, vtype)
 
     @robust
     def _show_ext_obj(self, item, val):
-        item.setText(item.text() + ": " + val.__class__.__name__)
         if val is None:
             self._show_val(item, val, "Value", None, ua.VariantType.Null)
             return
-        for field in fields(val):
-            member_val = getattr(val, field.name)
-            att_type = type_string_from_type(field.type)
-            if hasattr(ua.VariantType, att_type):
-                attr = getattr(ua.VariantType, att_type)
-            elif hasattr(ua, att_type):
-                attr = getattr(ua, att_type)
-            else:
-                return
-            self._show_val(item, val, field.name, member_val, attr)
+        for field in get_struct_fields(val.__class__):
+            self._show_val(item, val, field.name, getattr(val, field.name), field.uatype)
 
     def _show_timestamps(self, item, dv):
         #while item.hasChildren():
@@ -274,17 +706,81 @@ class AttrsWidget(QObject):
         item.appendRow([QStandardItem("Server Timestamp"), QStandardItem(string), QStandardItem(ua.VariantType.DateTime.name)])
         string = val_to_string(dv.SourceTimestamp)
         item.appendRow([QStandardItem("Source Timestamp"), QStandardItem(string), QStandardItem(ua.VariantType.DateTime.name)])
+        self._latency_items = (QStandardItem(), QStandardItem())
+        item.appendRow([QStandardItem("Source to Server Latency"), self._latency_items[0], QStandardItem("Duration")])
+        item.appendRow([QStandardItem("Server to Client Latency"), self._latency_items[1], QStandardItem("Duration")])
+        self._show_latencies(*self.latency_stats.latencies(dv, self._value_received))
+
+    def _show_latencies(self, source_server, server_client):
+        if self._latency_items is None:
+            return
+        for item, latency, values in zip(self._latency_items,
+                                         (source_server, server_client),
+                                         (self.latency_stats.source_server, self.latency_stats.server_client)):
+            if latency is None:
+                text = "None"
+            else:
+                text = "{:.3f} ms".format(latency * 1000)
+            if values:
+                p50, p95, p99 = (pct * 1000 for pct in self.latency_stats.percentiles(values))
+                text += " (p50={:.3f} p95={:.3f} p99={:.3f} ms over {} values)".format(p50, p95, p99, len(values))
+            item.setText(text)
+
+    def add_value_sample(self, dv, received=None):
+        """
+        give a DataValue of the Value of current node received from a subscription
+        to compute rolling latency percentiles
+        """
+        latencies = self.latency_stats.add(dv, received)
+        self._show_latencies(*latencies)
 
     def get_all_attrs(self):
         attrs = [attr for attr in ua.AttributeIds]
-        dvs = self.current_node.read_attributes(attrs)
+        nodeid = self.current_node.nodeid
+        if self.max_value_bytes and self.large_values.get(nodeid, True):
+            # value may be large, only read its first elements until we know its rank and data type
+            params = ua.ReadParameters()
+            for attr in attrs:
+                rv = ua.ReadValueId()
+                rv.NodeId = nodeid
+                rv.AttributeId = attr
+                if attr == ua.AttributeIds.Value:
+                    rv.IndexRange = index_range(0, first_elements(self.max_value_bytes) + 1)
+                params.NodesToRead.append(rv)
+            dvs = self.current_node.read_params(params)
+            bounded = True
+        else:
+            dvs = self.current_node.read_attributes(attrs)
+            bounded = False
+        self._value_received = datetime.now(timezone.utc)
         res = []
+        first = None
         for idx, dv in enumerate(dvs):
-            if dv.StatusCode.is_good():
+            if bounded and attrs[idx] == ua.AttributeIds.Value:
+                first = dv
+            elif dv.StatusCode.is_good():
                 res.append((attrs[idx], dv))
+        if bounded:
+            dv = self._read_value(dict(res), first)
+            self._value_received = datetime.now(timezone.utc)
+            if dv is not None and dv.StatusCode.is_good():
+                res.append((ua.AttributeIds.Value, dv))
         res.sort(key=lambda x: x[0].name)
         return res
 
+    def _read_value(self, dvs, first):
+        nclass = dvs.get(ua.AttributeIds.NodeClass)
+        if nclass is None or nclass.Value.Value not in (ua.NodeClass.Variable, ua.NodeClass.VariableType):
+            return None
+        rank = dvs.get(ua.AttributeIds.ValueRank)
+        rank = rank.Value.Value if rank else ua.ValueRank.Any
+        dtype = dvs.get(ua.AttributeIds.DataType)
+        dtype = dtype.Value.Value if dtype else ua.NodeId(ua.ObjectIds.BaseDataType)
+        dims = dvs.get(ua.AttributeIds.ArrayDimensions)
+        dims = dims.Value.Value if dims else None
+        self.large_values[self.current_node.nodeid] = value_may_exceed(rank, dtype, dims, self.max_value_bytes)
+        return read_value_bounded(self.current_node, rank, dtype, dims, self.max_value_bytes, first)
+
 
 class MyDelegate(QStyledItemDelegate):
 
@@ -308,38 +804,10 @@ class MyDelegate(QStyledItemDelegate):
             return QStyledItemDelegate.createEditor(self, parent, option, idx)
         elif data.attr == ua.AttributeIds.NodeId:
             return None
-        elif data.uatype == ua.VariantType.Boolean:
-            combo = QComboBox(parent)
-            combo.addItem("True")
-            combo.addItem("False")
-            combo.setCurrentText(text)
-            return combo
-        elif data.attr == ua.AttributeIds.NodeClass:
-            combo = QComboBox(parent)
-            for nclass in ua.NodeClass:
-                combo.addItem(nclass.name)
-            combo.setCurrentText(text)
-            return combo
-        elif data.attr == ua.AttributeIds.ValueRank:
-            combo = QComboBox(parent)
-            for rank in ua.ValueRank:
-                combo.addItem(rank.name)
-            combo.setCurrentText(text)
-            return combo
-        elif data.attr == ua.AttributeIds.DataType:
-            nodeid = data.value
-            node = new_node(self.attrs_widget.current_node, nodeid)
-            startnode = new_node(self.attrs_widget.current_node, ua.ObjectIds.BaseDataType)
-            button = GetNodeButton(parent, node, startnode)
-            return button
-        elif data.attr in (ua.AttributeIds.AccessLevel,
-                           ua.AttributeIds.UserAccessLevel,
-                           ua.AttributeIds.WriteMask,
-                           ua.AttributeIds.UserWriteMask,
-                           ua.AttributeIds.EventNotifier):
-            return BitEditor(parent, data.attr, data.value)
-        else:
+        editor = create_attribute_editor(parent, self.attrs_widget.current_node, data.attr, data.uatype, data.value, text)
+        if editor is None:
             return QStyledItemDelegate.createEditor(self, parent, option, idx)
+        return editor
 
     @trycatchslot
     def setModelData(self, editor, model, idx):
@@ -357,18 +825,129 @@ class MyDelegate(QStyledItemDelegate):
 
     def _set_list_data(self, data, editor, model, idx):
         text = editor.text()
-        data.mylist[data.idx] = string_to_val(text, data.uatype)
+        uatype = data.uatype
+        if uatype == ua.VariantType.ByteString and isinstance(data.value, int):
+            # element of a ByteString displayed as an integer
+            uatype = ua.VariantType.Byte
+        val = string_to_val(text, uatype)
+        data.value = val
+        old_text = model.data(idx, Qt.DisplayRole)
         model.setItemData(idx, {Qt.DisplayRole: text, Qt.UserRole: data})
+        self._forget_parent_texts(idx, model)
         attr_data = self._get_attr_data(idx, model)
-        self._write_attr(attr_data)
+        if data.mylist is attr_data.value and not isinstance(val, list):
+            # element of a one dimensional array, only write that element
+            self._write_list_element(attr_data, data.idx, val, idx)
+            return
+        old = data.mylist[data.idx]
+        data.mylist[data.idx] = val
+        if not self._write_parent_value(attr_data, idx, model):
+            # keep displaying the value of the server
+            data.mylist[data.idx] = old
+            data.value = old
+            model.setItemData(idx, {Qt.DisplayRole: old_text, Qt.UserRole: data})
+
+    def _write_list_element(self, data, index, val, idx=None):
+        """
+        write one element of an array attribute using IndexRange
+        and fall back to writing the complete array if the server rejects it.
+        return False if the element could not be written or staged
+        """
+        return self._write_list_range(data, index, [val], idx)
+
+    def _write_list_range(self, data, start, values, idx=None):
+        """
+        write contiguous elements of an array attribute, from start, using IndexRange
+        and fall back to writing the complete array if the server rejects it.
+        return False if the elements could not be written or staged
+        """
+        mylist = data.value
+        node = self.attrs_widget.current_node
+        stop = start + len(values)
+        status = None
+        if self.attrs_widget.staging and self.attrs_widget.has_staged(data.attr):
+            # complete value is already staged, it contains our elements
+            mylist[start:stop] = values
+            return self._write_attr(data, idx)
+        if isinstance(mylist, IndexRangeArray) or self._supports_index_range(node, data.attr):
+            if self.attrs_widget.staging:
+                mylist[start:stop] = values
+                dv = ua.DataValue(range_variant(values, data.uatype))
+                self.attrs_widget.stage_write(data, dv, idx, index_range(start, stop))
+                return True
+            logger.info("Writing elements %s to %s of attribute %s of node %s", start, stop - 1, data.attr, node)
+            try:
+                status = write_range(node, start, values, data.uatype, data.attr)
+            except Exception as ex:
+                logger.exception("Exception while writing range of %s", data.attr)
+                self.error.emit(ex)
+                return False
+            if status.is_good():
+                mylist[start:stop] = values
+                self.attr_written.emit(data.attr, ua.DataValue(range_variant(values, data.uatype)))
+                return True
+            if status.value not in INDEX_RANGE_WRITE_REJECTED or isinstance(mylist, IndexRangeArray):
+                ex = ua.UaStatusCodeError(status.value)
+                logger.warning("Writing range of %s failed: %s", data.attr, status)
+                self.error.emit(ex)
+                return False
+            logger.info("Server rejected IndexRange write with %s, writing complete value", status)
+            self.attrs_widget.index_range_support[node.nodeid] = False
+        mylist[start:stop] = values
+        return self._write_attr(data, idx)
+
+    def _supports_index_range(self, node, attr):
+        support = self.attrs_widget.index_range_support
+        if node.nodeid not in support:
+            try:
+                support[node.nodeid] = supports_index_range(node, attr)
+            except Exception:
+                logger.exception("Could not check IndexRange support of %s", node)
+                support[node.nodeid] = False
+        return support[node.nodeid]
 
     def _set_member_data(self, data, editor, model, idx):
-        val = string_to_val(editor.text(), data.uatype)
+        if data.obj is None:
+            logger.warning("Member %s has no structure, it cannot be set", data.name)
+            return
+        field = get_struct_field(data.obj.__class__, data.name)
+        val = string_to_val(editor.text(), field.uatype)
+        old = getattr(data.obj, data.name)
+        old_text = model.data(idx, Qt.DisplayRole)
         data.value = val
         model.setItemData(idx, {Qt.DisplayRole: editor.text(), Qt.UserRole: data})
         setattr(data.obj, data.name, val)
+        self._forget_parent_texts(idx, model)
         attr_data = self._get_attr_data(idx, model)
-        self._write_attr(attr_data)
+        if not self._write_parent_value(attr_data, idx, model):
+            # keep displaying the value of the server
+            setattr(data.obj, data.name, old)
+            data.value = old
+            model.setItemData(idx, {Qt.DisplayRole: old_text, Qt.UserRole: data})
+            return
+        if field.is_list:
+            item = self.attrs_widget.model.itemFromIndex(idx.siblingAtColumn(0))
+            self.attrs_widget.refresh_list(item, val, field.uatype)
+
+    def _write_parent_value(self, attr_data, idx, model):
+        """
+        write attribute of attr_data after the item at idx, inside one of its elements, was modified.
+        return False if the value could not be written or staged
+        """
+        if isinstance(attr_data.value, IndexRangeArray):
+            # array is not read completely, only write the element containing the item
+            element = self._get_array_element(idx, model, attr_data)
+            return self._write_list_element(attr_data, element.idx, element.value, idx)
+        return self._write_attr(attr_data, idx)
+
+    def _get_array_element(self, idx, model, attr_data):
+        # top level element of the array of attr_data containing the item at idx
+        while idx.isValid():
+            data = model.data(idx.siblingAtColumn(1), Qt.UserRole)
+            if isinstance(data, ListData) and data.mylist is attr_data.value:
+                return data
+            idx = idx.parent()
+        return None
 
     def _get_attr_data(self, idx, model):
         while True:
@@ -378,6 +957,15 @@ class MyDelegate(QStyledItemDelegate):
             if isinstance(data, AttributeData):
                 return data
 
+    def _forget_parent_texts(self, idx, model):
+        # values of parent rows were modified in place, their cached texts are outdated
+        idx = idx.parent()
+        while idx.isValid():
+            data = model.data(idx.siblingAtColumn(1), Qt.UserRole)
+            if isinstance(data, _Data):
+                data._text = None
+            idx = idx.parent()
+
     def _get_parent_data(self, idx, model):
         parent_idx = idx.parent()
         it = model.itemFromIndex(parent_idx.sibling(0, 1))
@@ -388,51 +976,169 @@ class MyDelegate(QStyledItemDelegate):
             #for value we checkd data type from the variable data type
             # this is more robust
             try:
-                data.uatype = self.attrs_widget.current_node.read_data_type_as_variant_type()
+                data.uatype = self.attrs_widget.get_value_variant_type()
             except Exception as ex:
                 logger.exception("Could get primitive type of variable %s", self.attrs_widget.current_node)
                 self.error.emit(ex)
                 raise
 
-        if data.attr == ua.AttributeIds.NodeClass:
-            data.value = ua.NodeClass[editor.currentText()]
-            text = editor.currentText()
-        elif data.attr == ua.AttributeIds.ValueRank:
-            data.value = ua.ValueRank[editor.currentText()]
-            text = editor.currentText()
-        elif data.attr == ua.AttributeIds.DataType:
-            data.value = editor.get_node().nodeid
-            text = data_type_to_string(data.value)
-        elif data.attr in (ua.AttributeIds.AccessLevel,
-                           ua.AttributeIds.UserAccessLevel,
-                           ua.AttributeIds.WriteMask,
-                           ua.AttributeIds.UserWriteMask,
-                           ua.AttributeIds.EventNotifier):
-            data.value = editor.get_byte()
-            text = enum_to_string(data.attr, data.value)
-        else:
-            if isinstance(editor, QComboBox):
-                text = editor.currentText()
-            else:
-                text = editor.text()
-            data.value = string_to_val(text, data.uatype)
+        old = data.value
+        data.value, text = read_attribute_editor(editor, self.attrs_widget.current_node, data.attr, data.uatype)
         model.setItemData(idx, {Qt.DisplayRole: text, Qt.UserRole: data})
-        self._write_attr(data)
+        changed = changed_range(old, data.value) if data.attr == ua.AttributeIds.Value else None
+        if changed is not None and changed[1] - changed[0] < len(old):
+            # only write the elements which were modified in the edited text
+            start, stop = changed
+            new = data.value
+            data.value = old
+            if not self._write_list_range(data, start, new[start:stop], idx):
+                data.value = new
+        else:
+            self._write_attr(data, idx)
         if isinstance(data.value, list):
             # we need to refresh children
             item = self.attrs_widget.model.itemFromIndex(idx.sibling(0, 0))
             self.attrs_widget.refresh_list(item, data.value, data.uatype)
 
-    def _write_attr(self, data):
-        dv = ua.DataValue(ua.Variant(data.value, VariantType=data.uatype))
+    def _write_attr(self, data, idx=None):
+        """
+        write or stage the value of data, return False if it failed
+        """
         try:
+            dv = ua.DataValue(ua.Variant(to_list(data.value), VariantType=data.uatype))
+            if self.attrs_widget.staging:
+                self.attrs_widget.stage_write(data, dv, idx)
+                return True
             logger.info("Writing attribute %s of node %s with value: %s", data.attr, self.attrs_widget.current_node, dv)
             self.attrs_widget.current_node.write_attribute(data.attr, dv)
         except Exception as ex:
-            logger.exception("Exception while writing %s to %s", dv, data.attr)
+            logger.exception("Exception while writing %s to %s", data.value, data.attr)
             self.error.emit(ex)
+            return False
+        self.attr_written.emit(data.attr, dv)
+        return True
+
+
+def create_attribute_editor(parent, node, attr, uatype, value, text):
+    """
+    return the editor widget for attribute attr of node, currently displayed as text
+    None is returned if the attribute is edited as text in a line edit
+    """
+    if uatype == ua.VariantType.Boolean:
+        combo = QComboBox(parent)
+        combo.addItem("True")
+        combo.addItem("False")
+        combo.setCurrentText(text)
+        return combo
+    elif attr == ua.AttributeIds.NodeClass:
+        combo = QComboBox(parent)
+        for nclass in ua.NodeClass:
+            combo.addItem(nclass.name)
+        combo.setCurrentText(text)
+        return combo
+    elif attr == ua.AttributeIds.ValueRank:
+        combo = QComboBox(parent)
+        for rank in ua.ValueRank:
+            combo.addItem(rank.name)
+        combo.setCurrentText(text)
+        return combo
+    elif attr == ua.AttributeIds.DataType:
+        dtype = new_node(node, value)
+        startnode = new_node(node, ua.ObjectIds.BaseDataType)
+        return GetNodeButton(parent, dtype, startnode)
+    elif attr in BITFIELD_ATTRIBUTES:
+        return BitEditor(parent, attr, value)
+    return None
+
+
+def read_attribute_editor(editor, node, attr, uatype):
+    """
+    return value and text of an editor created by create_attribute_editor
+    or of a line edit
+    """
+    if attr == ua.AttributeIds.NodeClass:
+        text = editor.currentText()
+        return ua.NodeClass[text], text
+    elif attr == ua.AttributeIds.ValueRank:
+        text = editor.currentText()
+        return ua.ValueRank[text], text
+    elif attr == ua.AttributeIds.DataType:
+        value = editor.get_node().nodeid
+        return value, name_cache.get_browse_name(node, value)
+    elif attr in BITFIELD_ATTRIBUTES:
+        value = editor.get_byte()
+        return value, enum_to_string(attr, value)
+    if isinstance(editor, QComboBox):
+        text = editor.currentText()
+    else:
+        text = editor.text()
+    return string_to_val(text, uatype), text
+
+
+StructField = namedtuple("StructField", ["name", "uatype", "is_list"])
+
+# structure class -> list of StructField, filled by get_struct_fields
+_struct_fields = {}
+
+
+def get_struct_fields(cls):
+    """
+    return name, VariantType or ua class and list flag of the fields of a structure class
+    Reflection on the class is only done the first time a class is seen
+    """
+    try:
+        return _struct_fields[cls]
+    except KeyError:
+        pass
+    descs = []
+    for field in fields(cls):
+        att_type = type_string_from_type(field.type)
+        if hasattr(ua.VariantType, att_type):
+            uatype = getattr(ua.VariantType, att_type)
+        elif hasattr(ua, att_type):
+            uatype = getattr(ua, att_type)
         else:
-            self.attr_written.emit(data.attr, dv)
+            # we do not know how to display the following fields
+            break
+        if isinstance(field.type, str):
+            is_list = field.type.strip("'\" ").startswith(("List[", "list["))
+        else:
+            is_list = type_is_list(field.type)
+        descs.append(StructField(field.name, uatype, is_list))
+    _struct_fields[cls] = descs
+    return descs
+
+
+def get_struct_field(cls, name):
+    for field in get_struct_fields(cls):
+        if field.name == name:
+            return field
+    raise KeyError("Structure {} has no displayable field {}".format(cls.__name__, name))
+
+
+def is_list(val):
+    return isinstance(val, (list, IndexRangeArray)) or is_ndarray(val)
+
+
+def has_fields(val, vtype):
+    """
+    True if val is displayed as an extension object with a row per field
+    """
+    if vtype == ua.VariantType.ExtensionObject:
+        return True
+    return not isinstance(vtype, ua.VariantType) and is_dataclass(val) and not isinstance(val, type)
+
+
+def value_to_string(val):
+    """
+    like val_to_string but only format the first elements of large lists
+    and only show a summary of numpy arrays
+    """
+    if is_ndarray(val):
+        return array_summary(val)
+    if isinstance(val, list) and len(val) > LIST_CHUNK_SIZE:
+        return "{}, ...] ({} elements)".format(val_to_string(val[:LIST_CHUNK_SIZE])[:-1], len(val))
+    return val_to_string(val)
 
 
 def attr_to_enum(attr):
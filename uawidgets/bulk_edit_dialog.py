@@ -0,0 +1,154 @@
+import logging
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QStandardItemModel, QStandardItem, QColor
+from PyQt5.QtWidgets import QPushButton, QLabel, QLineEdit, QHBoxLayout, QDialog, QVBoxLayout, QComboBox, QTableView, QAbstractItemView
+
+from asyncua import ua
+
+from uawidgets.attrs_widget import create_attribute_editor, read_attribute_editor, enum_to_string, value_to_string, BITFIELD_ATTRIBUTES
+from uawidgets.node_cache import name_cache, data_type_cache
+from uawidgets.utils import write_nodes_attribute
+
+
+logger = logging.getLogger(__name__)
+
+# attributes which can be written to many nodes at once
+BULK_ATTRIBUTES = [
+    ua.AttributeIds.DisplayName,
+    ua.AttributeIds.Description,
+    ua.AttributeIds.WriteMask,
+    ua.AttributeIds.UserWriteMask,
+    ua.AttributeIds.IsAbstract,
+    ua.AttributeIds.EventNotifier,
+    ua.AttributeIds.Value,
+    ua.AttributeIds.DataType,
+    ua.AttributeIds.ValueRank,
+    ua.AttributeIds.ArrayDimensions,
+    ua.AttributeIds.AccessLevel,
+    ua.AttributeIds.UserAccessLevel,
+    ua.AttributeIds.MinimumSamplingInterval,
+    ua.AttributeIds.Historizing,
+    ua.AttributeIds.Executable,
+    ua.AttributeIds.UserExecutable,
+]
+
+
+class BulkEditDialog(QDialog):
+    """
+    Edit one attribute and write it to many nodes with one Write request.
+    The editor is the one used by AttrsWidget, initialized with the attribute of the first node.
+    The StatusCode of the write is shown for every node
+    """
+
+    def __init__(self, parent, nodes, attr=ua.AttributeIds.AccessLevel):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("Bulk Attribute Edit")
+        self.nodes = list(nodes)
+        self.attr = None
+        self.uatype = None
+        self.editor = None
+        # StatusCodes of the last write, one per node
+        self.results = []
+
+        self.vlayout = QVBoxLayout(self)
+        layout = QHBoxLayout()
+        self.vlayout.addLayout(layout)
+        layout.addWidget(QLabel("Attribute:", self))
+        self.attr_combo = QComboBox(self)
+        for bulk_attr in BULK_ATTRIBUTES:
+            self.attr_combo.addItem(bulk_attr.name)
+        layout.addWidget(self.attr_combo)
+        self.editor_layout = QHBoxLayout()
+        self.vlayout.addLayout(self.editor_layout)
+
+        self.result_label = QLabel("{} nodes selected".format(len(self.nodes)), self)
+        self.vlayout.addWidget(self.result_label)
+        self.model = QStandardItemModel(self)
+        self.model.setHorizontalHeaderLabels(["Node", "Status"])
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.vlayout.addWidget(self.view)
+
+        layout = QHBoxLayout()
+        self.vlayout.addLayout(layout)
+        layout.addStretch()
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        layout.addWidget(close_button)
+        self.write_button = QPushButton("Write to All")
+        self.write_button.clicked.connect(self.write)
+        layout.addWidget(self.write_button)
+
+        self.attr_combo.currentTextChanged.connect(self._attr_changed)
+        self.attr_combo.setCurrentText(attr.name)
+        if self.attr is None:
+            self._attr_changed(attr.name)
+
+    def _attr_changed(self, name):
+        self.attr = ua.AttributeIds[name]
+        if self.editor is not None:
+            self.editor_layout.removeWidget(self.editor)
+            self.editor.deleteLater()
+            self.editor = None
+        if not self.nodes:
+            return
+        try:
+            self.editor = self._create_editor(self.nodes[0], self.attr)
+        except Exception as ex:
+            logger.exception("Could not read attribute %s of %s", self.attr, self.nodes[0])
+            self.result_label.setText(str(ex))
+            self.write_button.setEnabled(False)
+            return
+        self.editor_layout.addWidget(self.editor)
+        self.write_button.setEnabled(True)
+
+    def _create_editor(self, node, attr):
+        dv = node.read_attributes([attr])[0]
+        dv.StatusCode.check()
+        value = dv.Value.Value
+        self.uatype = dv.Value.VariantType
+        if attr == ua.AttributeIds.Value and self.uatype == ua.VariantType.Null:
+            self.uatype = data_type_cache.get_variant_type(node, node.read_data_type())
+        if attr == ua.AttributeIds.DataType:
+            text = name_cache.get_browse_name(node, value)
+        elif attr in BITFIELD_ATTRIBUTES:
+            text = enum_to_string(attr, value)
+        else:
+            text = value_to_string(value)
+        editor = create_attribute_editor(self, node, attr, self.uatype, value, text)
+        if editor is None:
+            editor = QLineEdit(text, self)
+        else:
+            # BitEditor is a dialog, show it inside ours
+            editor.setWindowFlags(Qt.Widget)
+        return editor
+
+    def write(self):
+        try:
+            self._write()
+        except Exception as ex:
+            logger.exception("Error writing attribute %s", self.attr)
+            self.result_label.setText(str(ex))
+
+    def _write(self):
+        node = self.nodes[0]
+        value, text = read_attribute_editor(self.editor, node, self.attr, self.uatype)
+        dv = ua.DataValue(ua.Variant(value, self.uatype))
+        logger.info("Writing attribute %s of %s nodes with value: %s", self.attr, len(self.nodes), dv)
+        self.results = write_nodes_attribute(node, [n.nodeid for n in self.nodes], self.attr, dv)
+        self.model.removeRows(0, self.model.rowCount())
+        good = 0
+        for n, status in zip(self.nodes, self.results):
+            status_item = QStandardItem(status.name)
+            if status.is_good():
+                good += 1
+                if self.attr == ua.AttributeIds.DisplayName:
+                    name_cache.forget(node, n.nodeid)
+            else:
+                status_item.setForeground(QColor("red"))
+            self.model.appendRow([QStandardItem(n.nodeid.to_string()), status_item])
+        self.result_label.setText("{} written to {} of {} nodes".format(text, good, len(self.nodes)))
+        self.view.resizeColumnsToContents()
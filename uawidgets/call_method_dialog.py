@@ -1,13 +1,263 @@
+import asyncio
 import logging
+import time
+from collections import Counter, deque
 
-from PyQt5.QtWidgets import QPushButton, QLabel, QLineEdit, QHBoxLayout, QDialog, QVBoxLayout
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QTimer
+from PyQt5.QtGui import QFontDatabase, QStandardItemModel, QStandardItem, QColor
+from PyQt5.QtWidgets import QPushButton, QLabel, QLineEdit, QHBoxLayout, QDialog, QVBoxLayout, QGroupBox, QSpinBox, QDoubleSpinBox, QTableView
 
 from asyncua.common.ua_utils import val_to_string, string_to_variant, data_type_to_string
-from asyncua.sync import call_method_full, data_type_to_variant_type
 from asyncua import ua
 
+from uawidgets.node_cache import name_cache, method_signatures, MethodSignature
+from uawidgets.utils import LatencyHistogram, Reservoir, call_methods
+
 logger = logging.getLogger(__name__)
 
+# milliseconds between two updates of the load test statistics
+LOAD_TEST_REFRESH_INTERVAL = 200
+# latencies kept by a load test to compute its percentiles
+LOAD_TEST_RESERVOIR_SIZE = 10000
+# seconds to wait for the answer to a method call, 0 to wait forever
+DEFAULT_CALL_TIMEOUT = 30.0
+
+
+def call_request(objectid, methodid, args):
+    request = ua.CallMethodRequest()
+    request.ObjectId = objectid
+    request.MethodId = methodid
+    request.InputArguments = args
+    return request
+
+
+class MethodCall(QObject):
+    """
+    Call a method from the event loop of the client without blocking the Qt thread.
+    The CallMethodResult is delivered by the finished signal. A call without answer
+    after timeout seconds fails with BadTimeout, a cancelled call with
+    BadRequestCancelledByClient, both through the error signal
+    """
+
+    finished = pyqtSignal(object)
+    error = pyqtSignal(Exception)
+    # emitted from the thread of the client
+    _done = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.timeout = DEFAULT_CALL_TIMEOUT
+        self._future = None
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+
+    @property
+    def running(self):
+        return self._future is not None
+
+    def start(self, node, request, timeout=DEFAULT_CALL_TIMEOUT):
+        """
+        send request, node is any node of the session
+        """
+        if self.running:
+            raise RuntimeError("A call is already running")
+        self.timeout = timeout
+        coro = asyncio.wait_for(node.aio_obj.session.call([request]), timeout or None)
+        self._future = asyncio.run_coroutine_threadsafe(coro, node.tloop.loop)
+        self._future.add_done_callback(self._done.emit)
+
+    def cancel(self):
+        """
+        stop waiting for the answer, the server may still execute the method
+        """
+        if self._future is not None:
+            self._future.cancel()
+
+    def _on_done(self, future):
+        if future is not self._future:
+            return
+        self._future = None
+        if future.cancelled():
+            logger.info("Method call cancelled")
+            self.error.emit(ua.UaStatusCodeError(ua.StatusCodes.BadRequestCancelledByClient))
+            return
+        try:
+            result = future.result()[0]
+        except asyncio.TimeoutError:
+            logger.warning("No answer to method call after %s s", self.timeout)
+            self.error.emit(ua.UaStatusCodeError(ua.StatusCodes.BadTimeout))
+            return
+        except Exception as ex:
+            logger.exception("Error calling method")
+            self.error.emit(ex)
+            return
+        self.finished.emit(result)
+
+
+class LoadTest(QObject):
+    """
+    Call a method repeatedly from the event loop of the client, count times
+    or during duration seconds, at most rate calls per second (0 for no limit)
+    with concurrency calls in flight at the same time.
+    Latency and StatusCode of each call are queued by the event loop
+    and collected in the Qt thread every LOAD_TEST_REFRESH_INTERVAL milliseconds.
+    Histogram and maximum count every call, percentiles are computed from
+    a random sample of LOAD_TEST_RESERVOIR_SIZE latencies
+    """
+
+    progress = pyqtSignal()
+    finished = pyqtSignal()
+    error = pyqtSignal(Exception)
+    # emitted from the thread of the client
+    _done = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.latencies = Reservoir(LOAD_TEST_RESERVOIR_SIZE)
+        self.latency_histogram = LatencyHistogram()
+        self.max_latency = 0.0
+        self.statuses = Counter()
+        self.elapsed = 0.0
+        self.running = False
+        self._start = None
+        self._future = None
+        self._stopped = False
+        # deque append and popleft are thread safe
+        self._samples = deque()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._collect)
+        self._done.connect(self._on_done, Qt.QueuedConnection)
+
+    def start(self, node, request, count=0, duration=0.0, rate=0.0, concurrency=1):
+        """
+        start calling request, node is any node of the session
+        """
+        if self.running:
+            raise RuntimeError("Load test is already running")
+        if not count and not duration:
+            raise ValueError("Load test needs a number of calls or a duration")
+        self.latencies = Reservoir(LOAD_TEST_RESERVOIR_SIZE)
+        self.latency_histogram = LatencyHistogram()
+        self.max_latency = 0.0
+        self.statuses = Counter()
+        self.elapsed = 0.0
+        self.running = True
+        self._stopped = False
+        self._samples.clear()
+        self._start = time.perf_counter()
+        logger.info("Starting load test of %s: count=%s duration=%s rate=%s concurrency=%s", request.MethodId, count, duration, rate, concurrency)
+        coro = self._run(node.aio_obj.session, request, count, duration, rate, max(concurrency, 1))
+        self._future = asyncio.run_coroutine_threadsafe(coro, node.tloop.loop)
+        self._future.add_done_callback(self._done.emit)
+        self._timer.start(LOAD_TEST_REFRESH_INTERVAL)
+
+    def stop(self):
+        """
+        stop sending calls, calls in flight are waited for
+        """
+        self._stopped = True
+
+    async def _run(self, session, request, count, duration, rate, concurrency):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        state = {"sent": 0, "next": start}
+
+        async def worker():
+            while not self._stopped:
+                if count and state["sent"] >= count:
+                    return
+                if duration and loop.time() - start >= duration:
+                    return
+                state["sent"] += 1
+                if rate:
+                    slot = max(state["next"], loop.time())
+                    state["next"] = slot + 1.0 / rate
+                    if slot > loop.time():
+                        await asyncio.sleep(slot - loop.time())
+                sent = time.perf_counter()
+                try:
+                    status = (await session.call([request]))[0].StatusCode.value
+                except ua.UaStatusCodeError as ex:
+                    status = ex.code
+                except asyncio.TimeoutError:
+                    status = ua.StatusCodes.BadTimeout
+                except Exception:
+                    # a failed call is a sample, it must not stop the other workers
+                    logger.debug("Error calling %s", request.MethodId, exc_info=True)
+                    status = ua.StatusCodes.Bad
+                self._samples.append((time.perf_counter() - sent, status))
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    def _collect(self):
+        if self._start is not None:
+            self.elapsed = time.perf_counter() - self._start
+        if not self._samples:
+            return
+        while self._samples:
+            latency, status = self._samples.popleft()
+            self.latencies.add(latency)
+            self.latency_histogram.add(latency)
+            self.max_latency = max(self.max_latency, latency)
+            self.statuses[status] += 1
+        self.progress.emit()
+
+    def _on_done(self, future):
+        self._timer.stop()
+        self._collect()
+        self.running = False
+        try:
+            future.result()
+        except Exception as ex:
+            logger.exception("Load test failed")
+            self.error.emit(ex)
+        logger.info("Load test finished: %s calls in %.3f s", self.count, self.elapsed)
+        self.progress.emit()
+        self.finished.emit()
+
+    @property
+    def count(self):
+        """
+        number of calls answered
+        """
+        return self.latencies.count
+
+    def throughput(self):
+        """
+        calls per second
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.count / self.elapsed
+
+    def percentiles(self, pcts=(50, 95, 99, 100)):
+        """
+        latency percentiles of the sampled calls, 100 is the exact maximum
+        """
+        return [self.max_latency if pct >= 100 else val for pct, val in zip(pcts, self.latencies.percentiles(pcts))]
+
+    def summary(self):
+        """
+        text of throughput, latency percentiles and StatusCode breakdown
+        """
+        lines = ["{} calls in {:.2f} s, {:.1f} calls/s".format(self.count, self.elapsed, self.throughput())]
+        if self.count:
+            lines.append("p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(*[val * 1000 for val in self.percentiles()]))
+        for status, count in self.statuses.most_common():
+            lines.append("{}: {}".format(ua.StatusCode(status).name, count))
+        return "\n".join(lines)
+
+    def histogram(self, width=40):
+        """
+        text histogram of the latencies
+        """
+        buckets = self.latency_histogram.buckets()
+        top = max(count for _, count in buckets) or 1
+        lines = []
+        for bound, count in buckets:
+            label = "<= {:g} ms".format(bound * 1000) if bound is not None else "slower"
+            lines.append("{:>12} {:>7} {}".format(label, count, "#" * int(round(width * count / top))))
+        return "\n".join(lines)
+
 
 class CallMethodDialog(QDialog):
     def __init__(self, parent, server, node):
@@ -21,16 +271,16 @@ class CallMethodDialog(QDialog):
         self.vlayout.addLayout(self.layout)
         self.inputs = []
         self.outputs = []
+        # arguments and parent are read once per session and method
+        try:
+            self.signature = method_signatures.get(node)
+        except Exception:
+            logger.exception("Error reading method signature")
+            self.signature = MethodSignature(None, [], [], [])
 
         self.vlayout.addWidget(QLabel("Input Arguments:", self))
-        try:
-            inputs = node.get_child("0:InputArguments")
-            args = inputs.read_value()
-            for arg in args:
-                self._add_input(arg)
-        except ua.UaError as ex:
-            logger.exception("Error reading input arguments")
-            print(ex)
+        for arg, vtype in zip(self.signature.inputs, self.signature.input_types):
+            self._add_input(arg, vtype)
 
         layout = QHBoxLayout()
         self.vlayout.addLayout(layout)
@@ -39,14 +289,8 @@ class CallMethodDialog(QDialog):
         layout.addWidget(self.result_label)
 
         self.vlayout.addWidget(QLabel("Output Arguments:", self))
-        try:
-            outputs = node.get_child("0:OutputArguments")
-            args = outputs.read_value()
-            for arg in args:
-                self._add_output(arg)
-        except ua.UaError as ex:
-            logger.exception("Error reading ouput arguments")
-            print(ex)
+        for arg in self.signature.outputs:
+            self._add_output(arg)
 
         layout = QHBoxLayout()
         self.vlayout.addLayout(layout)
@@ -54,38 +298,135 @@ class CallMethodDialog(QDialog):
         close_button = QPushButton("Close")
         close_button.clicked.connect(self.close)
         layout.addWidget(close_button)
-        call_button = QPushButton("Call Method")
-        call_button.clicked.connect(self.call)
-        layout.addWidget(call_button)
+        layout.addWidget(QLabel("Timeout (s):", self))
+        self.timeout_spinbox = QDoubleSpinBox(self)
+        self.timeout_spinbox.setRange(0, 86400)
+        self.timeout_spinbox.setValue(DEFAULT_CALL_TIMEOUT)
+        self.timeout_spinbox.setToolTip("0 to wait forever")
+        layout.addWidget(self.timeout_spinbox)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        layout.addWidget(self.cancel_button)
+        self.call_button = QPushButton("Call Method")
+        self.call_button.clicked.connect(self.call)
+        layout.addWidget(self.call_button)
+
+        # calls run in the event loop of the client, the dialog stays responsive
+        self.method_call = MethodCall(self)
+        self.method_call.finished.connect(self._call_finished)
+        self.method_call.error.connect(self._call_failed)
+        self.cancel_button.clicked.connect(self.method_call.cancel)
+
+        self._add_load_test()
 
     def call(self):
         try:
-            self._call()
+            request = call_request(self._parent(), self.node.nodeid, self._read_inputs())
+            self.method_call.start(self.node, request, self.timeout_spinbox.value())
         except Exception as ex:
             logger.exception("Error calling method")
             self.result_label.setText(str(ex))
+            return
+        self.result_label.setText("Calling...")
+        self.call_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
 
-    def _call(self):
-        parent = self.node.get_parent()
-        args = []
-        for inp in self.inputs:
-            val = string_to_variant(inp.text(), data_type_to_variant_type(inp.data_type))
-            args.append(val)
-
-        result = call_method_full(parent, self.node, *args)
+    def _call_finished(self, result):
+        self._call_done()
         self.result_label.setText(str(result.StatusCode))
-
         for idx, res in enumerate(result.OutputArguments):
-            self.outputs[idx].setText(val_to_string(res))
+            self.outputs[idx].setText(val_to_string(res.Value))
+
+    def _call_failed(self, ex):
+        self._call_done()
+        self.result_label.setText(str(ex))
+
+    def _call_done(self):
+        self.call_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def _parent(self):
+        if self.signature.parent is None:
+            raise ua.UaError("Method {} has no parent to call it on".format(self.node))
+        return self.signature.parent
+
+    def _read_inputs(self):
+        return [string_to_variant(inp.text(), inp.vtype) for inp in self.inputs]
+
+    def _add_load_test(self):
+        group = QGroupBox("Load Test", self)
+        self.vlayout.addWidget(group)
+        vlayout = QVBoxLayout(group)
+        layout = QHBoxLayout()
+        vlayout.addLayout(layout)
+        layout.addWidget(QLabel("Calls:", group))
+        self.count_spinbox = QSpinBox(group)
+        self.count_spinbox.setRange(0, 10000000)
+        self.count_spinbox.setValue(100)
+        self.count_spinbox.setToolTip("0 to only stop after the duration")
+        layout.addWidget(self.count_spinbox)
+        layout.addWidget(QLabel("Duration (s):", group))
+        self.duration_spinbox = QDoubleSpinBox(group)
+        self.duration_spinbox.setRange(0, 86400)
+        self.duration_spinbox.setToolTip("0 to only stop after the number of calls")
+        layout.addWidget(self.duration_spinbox)
+        layout.addWidget(QLabel("Rate (calls/s):", group))
+        self.rate_spinbox = QDoubleSpinBox(group)
+        self.rate_spinbox.setRange(0, 100000)
+        self.rate_spinbox.setToolTip("0 for no limit")
+        layout.addWidget(self.rate_spinbox)
+        layout.addWidget(QLabel("Concurrency:", group))
+        self.concurrency_spinbox = QSpinBox(group)
+        self.concurrency_spinbox.setRange(1, 1000)
+        layout.addWidget(self.concurrency_spinbox)
+        self.load_button = QPushButton("Start", group)
+        self.load_button.clicked.connect(self.toggle_load_test)
+        layout.addWidget(self.load_button)
+        self.load_label = QLabel("", group)
+        vlayout.addWidget(self.load_label)
+        self.histogram_label = QLabel("", group)
+        self.histogram_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        vlayout.addWidget(self.histogram_label)
+
+        self.load_test = LoadTest(self)
+        self.load_test.progress.connect(self._show_load_test)
+        self.load_test.finished.connect(self._load_test_finished)
+        self.load_test.error.connect(lambda ex: self.load_label.setText(str(ex)))
+
+    def toggle_load_test(self):
+        if self.load_test.running:
+            self.load_test.stop()
+            return
+        try:
+            request = call_request(self._parent(), self.node.nodeid, self._read_inputs())
+            self.load_test.start(self.node, request, self.count_spinbox.value(), self.duration_spinbox.value(),
+                                 self.rate_spinbox.value(), self.concurrency_spinbox.value())
+        except Exception as ex:
+            logger.exception("Error starting load test")
+            self.load_label.setText(str(ex))
+            return
+        self.load_button.setText("Stop")
 
-    def _add_input(self, arg):
+    def _show_load_test(self):
+        self.load_label.setText(self.load_test.summary())
+        self.histogram_label.setText(self.load_test.histogram())
+
+    def _load_test_finished(self):
+        self.load_button.setText("Start")
+
+    def closeEvent(self, event):
+        self.method_call.cancel()
+        self.load_test.stop()
+        QDialog.closeEvent(self, event)
+
+    def _add_input(self, arg, vtype):
         layout = QHBoxLayout()
         self.vlayout.addLayout(layout)
         layout.addWidget(QLabel("Name:{}".format(arg.Name), self))
         layout.addWidget(QLabel("Data type:{}".format(data_type_to_string(arg.DataType)), self))
         layout.addWidget(QLabel("Description:{}".format(arg.Description.Text), self))
         lineedit = QLineEdit(self)
-        lineedit.data_type = self.server.get_node(arg.DataType)
+        lineedit.vtype = vtype
         self.inputs.append(lineedit)
         layout.addWidget(lineedit)
 
@@ -97,3 +438,104 @@ class CallMethodDialog(QDialog):
         label = QLabel("", self)
         self.outputs.append(label)
         layout.addWidget(label)
+
+
+class BatchCallDialog(QDialog):
+    """
+    Call a method on many objects with one Call request,
+    split as required by the MaxNodesPerMethodCall limit of the server.
+    Each row is one call, its input arguments can be edited and
+    its StatusCode and output arguments are shown after the call
+    """
+
+    def __init__(self, parent, node, objects):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("UA Batch Method Call")
+        self.node = node
+        error = None
+        try:
+            self.signature = method_signatures.get(node)
+        except Exception as ex:
+            logger.exception("Error reading method signature")
+            self.signature = MethodSignature(None, [], [], [])
+            error = ex
+        # CallMethodResults of the last call, one per row
+        self.results = []
+
+        self.vlayout = QVBoxLayout(self)
+        self.vlayout.addWidget(QLabel("Method: {}".format(name_cache.get_display_name(node, node.nodeid)), self))
+        labels = ["Object"]
+        labels += ["{} ({})".format(arg.Name, data_type_to_string(arg.DataType)) for arg in self.signature.inputs]
+        labels += ["Status", "Output Arguments"]
+        self.model = QStandardItemModel(self)
+        self.model.setHorizontalHeaderLabels(labels)
+        self.view = QTableView(self)
+        self.view.setModel(self.model)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.vlayout.addWidget(self.view)
+        name_cache.prefetch(node, [obj.nodeid for obj in objects])
+        for obj in objects:
+            self.add_call(obj.nodeid)
+
+        self.result_label = QLabel(str(error) if error is not None else "{} calls".format(len(objects)), self)
+        self.vlayout.addWidget(self.result_label)
+        layout = QHBoxLayout()
+        self.vlayout.addLayout(layout)
+        layout.addStretch()
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        layout.addWidget(close_button)
+        call_button = QPushButton("Call All")
+        call_button.clicked.connect(self.call)
+        layout.addWidget(call_button)
+
+    def add_call(self, objectid, args=None):
+        """
+        add a row calling the method on objectid with input arguments args given as strings
+        """
+        if args is None:
+            args = [""] * len(self.signature.inputs)
+        item = QStandardItem(name_cache.get_display_name(self.node, objectid))
+        item.setData(objectid)
+        item.setEditable(False)
+        row = [item] + [QStandardItem(arg) for arg in args]
+        for _ in range(2):
+            result = QStandardItem()
+            result.setEditable(False)
+            row.append(result)
+        self.model.appendRow(row)
+
+    def requests(self):
+        requests = []
+        for row in range(self.model.rowCount()):
+            args = []
+            for idx, vtype in enumerate(self.signature.input_types):
+                args.append(string_to_variant(self.model.item(row, idx + 1).text(), vtype))
+            requests.append(call_request(self.model.item(row, 0).data(), self.node.nodeid, args))
+        return requests
+
+    def call(self):
+        try:
+            self._call()
+        except Exception as ex:
+            logger.exception("Error calling method")
+            self.result_label.setText(str(ex))
+
+    def _call(self):
+        requests = self.requests()
+        logger.info("Calling %s on %s objects", self.node, len(requests))
+        self.results = call_methods(self.node, requests)
+        status_column = len(self.signature.inputs) + 1
+        good = 0
+        for row, result in enumerate(self.results):
+            status = self.model.item(row, status_column)
+            status.setText(result.StatusCode.name)
+            if result.StatusCode.is_good():
+                good += 1
+                status.setForeground(QColor("black"))
+            else:
+                status.setForeground(QColor("red"))
+            outputs = ", ".join(val_to_string(val.Value) for val in result.OutputArguments)
+            self.model.item(row, status_column + 1).setText(outputs)
+        self.result_label.setText("{} of {} calls succeeded".format(good, len(self.results)))
+        self.view.resizeColumnsToContents()
@@ -0,0 +1,143 @@
+import logging
+from collections import Counter
+
+from PyQt5.QtCore import pyqtSignal, QObject, QSettings, Qt
+from PyQt5.QtGui import QStandardItemModel, QStandardItem, QColor
+from PyQt5.QtWidgets import QApplication, QMenu, QAction, QAbstractItemView
+
+from asyncua import ua
+from asyncua.common.ua_utils import val_to_string
+
+from uawidgets.attrs_widget import enum_to_string, value_to_string, BITFIELD_ATTRIBUTES
+from uawidgets.node_cache import name_cache
+from uawidgets.utils import trycatchslot, read_nodes_attributes
+
+
+logger = logging.getLogger(__name__)
+
+DIFF_COLOR = QColor(255, 220, 160)
+
+DEFAULT_ATTRIBUTES = [
+    ua.AttributeIds.DisplayName,
+    ua.AttributeIds.DataType,
+    ua.AttributeIds.AccessLevel,
+    ua.AttributeIds.Value,
+]
+
+
+class CompareWidget(QObject):
+    """
+    Show the same attributes of several nodes in a grid, one row per node.
+    All attributes are read with as few Read requests as the server allows
+    and cells differing from the most common value of their column are highlighted
+    """
+
+    error = pyqtSignal(Exception)
+
+    def __init__(self, view, show_timestamps=True):
+        QObject.__init__(self, view)
+        self.view = view
+        self._timestamps = show_timestamps
+        self.model = QStandardItemModel()
+        self.view.setModel(self.model)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.settings = QSettings()
+        state = self.settings.value("WindowState/compare_widget_state", None)
+        if state is not None:
+            self.view.horizontalHeader().restoreState(state)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.nodes = []
+        self.attrs = list(DEFAULT_ATTRIBUTES)
+
+        self.reloadAction = QAction("Reload", self.model)
+        self.reloadAction.triggered.connect(self.reload)
+        copyaction = QAction("&Copy Value", self.model)
+        copyaction.triggered.connect(self._copy_value)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.showContextMenu)
+        self._contextMenu = QMenu()
+        self._contextMenu.addAction(self.reloadAction)
+        self._contextMenu.addAction(copyaction)
+
+    def save_state(self):
+        self.settings.setValue("WindowState/compare_widget_state", self.view.horizontalHeader().saveState())
+
+    def showContextMenu(self, position):
+        if self.nodes:
+            self._contextMenu.exec_(self.view.viewport().mapToGlobal(position))
+
+    def _copy_value(self):
+        idx = self.view.currentIndex()
+        if idx.isValid():
+            QApplication.clipboard().setText(idx.data())
+
+    def clear(self):
+        self.model.clear()
+        self.nodes = []
+
+    @trycatchslot
+    def reload(self):
+        self.show_nodes(self.nodes, self.attrs)
+
+    def show_nodes(self, nodes, attrs=None):
+        """
+        compare attributes attrs of nodes, by default DisplayName, DataType, AccessLevel and Value
+        """
+        if attrs is None:
+            attrs = self.attrs
+        self.clear()
+        self.nodes = list(nodes)
+        self.attrs = list(attrs)
+        if not self.nodes:
+            return
+        labels = [attr.name for attr in self.attrs]
+        if self._timestamps and ua.AttributeIds.Value in self.attrs:
+            labels += ["Source Timestamp", "Server Timestamp"]
+        self.model.setHorizontalHeaderLabels(labels)
+        try:
+            results = read_nodes_attributes(self.nodes[0], [node.nodeid for node in self.nodes], self.attrs)
+            dtypes = [dv.Value.Value for dvs in results for attr, dv in zip(self.attrs, dvs) if attr == ua.AttributeIds.DataType and dv.StatusCode.is_good()]
+            name_cache.prefetch(self.nodes[0], dtypes)
+        except Exception as ex:
+            self.error.emit(ex)
+            raise
+        for node, dvs in zip(self.nodes, results):
+            self._add_row(node, dvs)
+        self._highlight_differences()
+        self.view.resizeColumnsToContents()
+
+    def _add_row(self, node, dvs):
+        row = []
+        for attr, dv in zip(self.attrs, dvs):
+            item = QStandardItem(self._to_string(node, attr, dv))
+            item.setData(dv, Qt.UserRole)
+            if not dv.StatusCode.is_good():
+                item.setForeground(QColor("gray"))
+            row.append(item)
+        if self._timestamps and ua.AttributeIds.Value in self.attrs:
+            value_dv = dvs[self.attrs.index(ua.AttributeIds.Value)]
+            row.append(QStandardItem(val_to_string(value_dv.SourceTimestamp)))
+            row.append(QStandardItem(val_to_string(value_dv.ServerTimestamp)))
+        self.model.appendRow(row)
+        self.model.setVerticalHeaderItem(self.model.rowCount() - 1, QStandardItem(node.nodeid.to_string()))
+
+    def _to_string(self, node, attr, dv):
+        if not dv.StatusCode.is_good():
+            return dv.StatusCode.name
+        if attr == ua.AttributeIds.DataType:
+            return name_cache.get_browse_name(node, dv.Value.Value)
+        if attr in BITFIELD_ATTRIBUTES:
+            return enum_to_string(attr, dv.Value.Value)
+        return value_to_string(dv.Value.Value)
+
+    def _highlight_differences(self):
+        # timestamps are always different, only compare attributes
+        for col in range(len(self.attrs)):
+            texts = [self.model.item(row, col).text() for row in range(self.model.rowCount())]
+            reference, count = Counter(texts).most_common(1)[0]
+            if count == 1 and len(texts) > 1:
+                # all values are different, for example DisplayName
+                continue
+            for row, text in enumerate(texts):
+                if text != reference:
+                    self.model.item(row, col).setBackground(DIFF_COLOR)
@@ -0,0 +1,313 @@
+"""
+Graph of the nodes around a node, crawled breadth first by following references.
+Each level is browsed with multi-node Browse requests, at most max_concurrency
+of them in flight at the same time, and drawn as soon as a request answers
+"""
+import asyncio
+import logging
+
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QLineF
+from PyQt5.QtGui import QPen, QBrush, QColor
+from PyQt5.QtWidgets import QGraphicsScene, QGraphicsSimpleTextItem, QGraphicsRectItem, QMenu, QAction
+
+from asyncua import ua
+from asyncua.sync import new_node
+
+from uawidgets.node_cache import name_cache, operation_limits
+from uawidgets.utils import trycatchslot, chunks
+
+
+logger = logging.getLogger(__name__)
+
+# number of hops followed from the start node
+DEFAULT_DEPTH = 2
+# Browse requests sent at the same time
+DEFAULT_CONCURRENCY = 4
+# nodes browsed in one request, lowered to MaxNodesPerBrowse of the server
+BATCH_SIZE = 100
+# crawl stops after discovering that many nodes
+MAX_NODES = 2000
+
+COLUMN_WIDTH = 260
+ROW_HEIGHT = 28
+
+NODECLASS_COLORS = {
+    ua.NodeClass.Object: QColor(220, 230, 250),
+    ua.NodeClass.Variable: QColor(220, 245, 220),
+    ua.NodeClass.Method: QColor(250, 230, 200),
+    ua.NodeClass.ObjectType: QColor(200, 210, 240),
+    ua.NodeClass.VariableType: QColor(200, 235, 200),
+    ua.NodeClass.ReferenceType: QColor(240, 220, 240),
+    ua.NodeClass.DataType: QColor(245, 245, 200),
+}
+
+
+async def _browse_batch(session, descs):
+    """
+    browse all descs, following continuation points,
+    return the list of references of each of them
+    """
+    params = ua.BrowseParameters()
+    params.NodesToBrowse = descs
+    results = await session.browse(params)
+    refs = [list(result.References) if result.StatusCode.is_good() else [] for result in results]
+    points = [(idx, result.ContinuationPoint) for idx, result in enumerate(results) if result.StatusCode.is_good() and result.ContinuationPoint]
+    while points:
+        params = ua.BrowseNextParameters()
+        params.ReleaseContinuationPoints = False
+        params.ContinuationPoints = [point for _, point in points]
+        results = await session.browse_next(params)
+        next_points = []
+        for (idx, _), result in zip(points, results):
+            if not result.StatusCode.is_good():
+                continue
+            refs[idx].extend(result.References)
+            if result.ContinuationPoint:
+                next_points.append((idx, result.ContinuationPoint))
+        points = next_points
+    return refs
+
+
+class ReferenceCrawler(QObject):
+    """
+    Breadth first traversal of references from a start node.
+    A level is browsed when the previous one is finished, so every node is
+    found at its shortest distance and browsed only once.
+    Browse requests run in the event loop of the client, results are
+    delivered in the Qt thread through the signals
+    """
+
+    # source NodeId, ReferenceDescriptions of source, depth of source
+    references_found = pyqtSignal(object, list, int)
+    finished = pyqtSignal()
+    error = pyqtSignal(Exception)
+    # emitted from the thread of the client
+    _batch_done = pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        QObject.__init__(self, parent)
+        self.node = None
+        self.max_depth = DEFAULT_DEPTH
+        self.max_concurrency = DEFAULT_CONCURRENCY
+        self.reference_type = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+        self.direction = ua.BrowseDirection.Forward
+        self.visited = set()
+        self.running = False
+        self._batch_size = BATCH_SIZE
+        self._depth = 0
+        self._next_level = []
+        self._queue = []
+        self._futures = set()
+        self._batch_done.connect(self._on_batch_done, Qt.QueuedConnection)
+
+    def start(self, node, max_depth=DEFAULT_DEPTH, max_concurrency=DEFAULT_CONCURRENCY):
+        self.cancel()
+        self.node = node
+        self.max_depth = max_depth
+        self.max_concurrency = max(max_concurrency, 1)
+        limit = operation_limits.get(node, ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerBrowse)
+        self._batch_size = min(BATCH_SIZE, limit) if limit else BATCH_SIZE
+        self.visited = {node.nodeid}
+        self.running = True
+        self._start_level(0, [node.nodeid])
+
+    def stop(self):
+        """
+        stop the crawl and emit finished, requests already sent are ignored
+        """
+        if self.cancel():
+            self.finished.emit()
+
+    def cancel(self):
+        """
+        stop the crawl without emitting finished, for example before restarting it.
+        return True if the crawl was running
+        """
+        if not self.running:
+            return False
+        logger.info("Stopping crawl of %s, %s nodes found", self.node, len(self.visited))
+        self.running = False
+        self._queue = []
+        self._next_level = []
+        for future in self._futures:
+            future.cancel()
+        self._futures = set()
+        return True
+
+    def _start_level(self, depth, nodeids):
+        logger.info("Crawling %s nodes at depth %s from %s", len(nodeids), depth, self.node)
+        self._depth = depth
+        self._next_level = []
+        self._queue = chunks(nodeids, self._batch_size)
+        self._send()
+
+    def _description(self, nodeid):
+        desc = ua.BrowseDescription()
+        desc.NodeId = nodeid
+        desc.BrowseDirection = self.direction
+        desc.ReferenceTypeId = self.reference_type
+        desc.IncludeSubtypes = True
+        desc.NodeClassMask = ua.NodeClass.Unspecified
+        desc.ResultMask = ua.BrowseResultMask.All
+        return desc
+
+    def _send(self):
+        while self._queue and len(self._futures) < self.max_concurrency:
+            nodeids = self._queue.pop(0)
+            coro = _browse_batch(self.node.aio_obj.session, [self._description(nodeid) for nodeid in nodeids])
+            future = asyncio.run_coroutine_threadsafe(coro, self.node.tloop.loop)
+            self._futures.add(future)
+            future.add_done_callback(lambda fut, nodeids=nodeids: self._batch_done.emit(nodeids, fut))
+
+    def _on_batch_done(self, nodeids, future):
+        if future not in self._futures:
+            # stopped or restarted
+            return
+        self._futures.discard(future)
+        try:
+            results = future.result()
+        except Exception as ex:
+            logger.exception("Error browsing references of %s nodes", len(nodeids))
+            self.error.emit(ex)
+            self.stop()
+            return
+        for nodeid, refs in zip(nodeids, results):
+            self.references_found.emit(nodeid, refs, self._depth)
+            if self._depth + 1 >= self.max_depth:
+                continue
+            for ref in refs:
+                if ref.NodeId not in self.visited and len(self.visited) < MAX_NODES:
+                    self.visited.add(ref.NodeId)
+                    self._next_level.append(ref.NodeId)
+        if not self.running:
+            # a slot of references_found stopped the crawl
+            return
+        self._send()
+        if self._futures:
+            return
+        if self._next_level:
+            self._start_level(self._depth + 1, self._next_level)
+        else:
+            logger.info("Crawl of %s finished, %s nodes found", self.node, len(self.visited))
+            self.running = False
+            self.finished.emit()
+
+
+class GraphWidget(QObject):
+    """
+    Draw the nodes found by a ReferenceCrawler in a QGraphicsView,
+    one column per distance from the start node
+    """
+
+    error = pyqtSignal(Exception)
+    finished = pyqtSignal()
+
+    def __init__(self, view):
+        QObject.__init__(self, view)
+        self.view = view
+        self.scene = QGraphicsScene(self)
+        self.view.setScene(self.scene)
+        self.crawler = ReferenceCrawler(self)
+        self.crawler.references_found.connect(self._add_references)
+        self.crawler.error.connect(self.error.emit)
+        self.crawler.finished.connect(self.finished.emit)
+        self.node = None
+        # item of each drawn node, by NodeId
+        self.items = {}
+        self.edges = []
+        self._rows = []
+
+        self.stopAction = QAction("Stop Crawl", self)
+        self.stopAction.triggered.connect(self.stop)
+        self.reloadAction = QAction("Reload", self)
+        self.reloadAction.triggered.connect(self.reload)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.showContextMenu)
+        self._contextMenu = QMenu()
+        self._contextMenu.addAction(self.reloadAction)
+        self._contextMenu.addAction(self.stopAction)
+
+    def showContextMenu(self, position):
+        if self.node is None:
+            return
+        self.stopAction.setEnabled(self.crawler.running)
+        self._contextMenu.exec_(self.view.viewport().mapToGlobal(position))
+
+    def clear(self):
+        self.crawler.cancel()
+        self.scene.clear()
+        self.items = {}
+        self.edges = []
+        self._rows = []
+        self.node = None
+
+    def stop(self):
+        self.crawler.stop()
+
+    @trycatchslot
+    def reload(self):
+        self.show_graph(self.node, self.crawler.max_depth, self.crawler.max_concurrency)
+
+    def show_graph(self, node, max_depth=DEFAULT_DEPTH, max_concurrency=DEFAULT_CONCURRENCY, reference_type=None, direction=None):
+        """
+        crawl the references of node up to max_depth hops and draw them while they are found
+        """
+        self.clear()
+        self.node = node
+        if reference_type is not None:
+            self.crawler.reference_type = ua.NodeId(reference_type) if isinstance(reference_type, int) else reference_type
+        if direction is not None:
+            self.crawler.direction = direction
+        self._add_node(node.nodeid, name_cache.get_display_name(node, node.nodeid), ua.NodeClass.Unspecified, 0)
+        self.crawler.start(node, max_depth, max_concurrency)
+
+    def _add_node(self, nodeid, text, nodeclass, depth):
+        while len(self._rows) <= depth:
+            self._rows.append(0)
+        x = depth * COLUMN_WIDTH
+        y = self._rows[depth] * ROW_HEIGHT
+        self._rows[depth] += 1
+        label = QGraphicsSimpleTextItem(text)
+        label.setToolTip("{}\n{}".format(nodeid.to_string(), nodeclass.name))
+        rect = label.boundingRect().adjusted(-4, -2, 4, 2)
+        item = QGraphicsRectItem(rect)
+        item.setBrush(QBrush(NODECLASS_COLORS.get(nodeclass, QColor(235, 235, 235))))
+        item.setPos(x, y)
+        item.setData(0, nodeid)
+        label.setParentItem(item)
+        self.scene.addItem(item)
+        self.items[nodeid] = item
+        return item
+
+    def _add_references(self, nodeid, refs, depth):
+        source = self.items.get(nodeid)
+        if source is None:
+            return
+        # names of reference types shown by edges are read in one request for all references of the node
+        try:
+            name_cache.prefetch(self.node, [ref.ReferenceTypeId for ref in refs])
+        except Exception:
+            logger.exception("Could not read names of reference types")
+        for ref in refs:
+            target = self.items.get(ref.NodeId)
+            if target is None:
+                target = self._add_node(ref.NodeId, ref.DisplayName.Text or ref.BrowseName.to_string(), ref.NodeClass, depth + 1)
+            self._add_edge(source, target, ref)
+
+    def _add_edge(self, source, target, ref):
+        start = source.sceneBoundingRect()
+        end = target.sceneBoundingRect()
+        line = self.scene.addLine(QLineF(start.right(), start.center().y(), end.left(), end.center().y()), QPen(QColor("gray")))
+        line.setZValue(-1)
+        line.setToolTip(name_cache.get_browse_name(self.node, ref.ReferenceTypeId))
+        self.edges.append((source.data(0), ref.ReferenceTypeId, target.data(0)))
+
+    def node_at(self, item):
+        """
+        return the node drawn by item of the scene, or None
+        """
+        while item is not None and item.data(0) is None:
+            item = item.parentItem()
+        if item is None:
+            return None
+        return new_node(self.node, item.data(0))
@@ -0,0 +1,295 @@
+"""
+Table of the history of a variable, read page by page with HistoryRead
+"""
+import logging
+from datetime import timezone
+
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QSettings, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication, QMenu, QAction, QAbstractItemView
+
+from asyncua import ua
+from asyncua.common.ua_utils import val_to_string
+
+from uawidgets.array_utils import np, VARIANT_TO_DTYPE
+from uawidgets.utils import trycatchslot, call_service
+
+
+logger = logging.getLogger(__name__)
+
+# number of values asked to the server in one HistoryRead request
+PAGE_SIZE = 1000
+
+
+def _to_naive_utc(dt):
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class HistoryColumns(object):
+    """
+    Timestamps, values and status codes of history samples.
+    With numpy they are kept in typed arrays whose capacity doubles when full,
+    values which do not fit the type of the array turn it into an object array.
+    Without numpy python lists are used
+    """
+
+    def __init__(self, vtype=None):
+        self.vtype = vtype
+        self._size = 0
+        if np is None:
+            self.timestamps = []
+            self.values = []
+            self.statuses = []
+        else:
+            self.timestamps = np.empty(0, dtype="datetime64[us]")
+            self.values = np.empty(0, dtype=VARIANT_TO_DTYPE.get(vtype, object))
+            self.statuses = np.empty(0, dtype="uint32")
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        capacity = len(self.timestamps)
+        if size <= capacity:
+            return
+        capacity = max(capacity * 2, size, PAGE_SIZE)
+        for name in ("timestamps", "values", "statuses"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def append(self, dvs):
+        if np is None:
+            for dv in dvs:
+                self.timestamps.append(dv.SourceTimestamp or dv.ServerTimestamp)
+                self.values.append(dv.Value.Value if dv.Value is not None else None)
+                self.statuses.append(dv.StatusCode.value)
+            self._size += len(dvs)
+            return
+        start = self._size
+        stop = start + len(dvs)
+        self._reserve(stop)
+        self.timestamps[start:stop] = [_to_naive_utc(dv.SourceTimestamp or dv.ServerTimestamp) for dv in dvs]
+        self.statuses[start:stop] = [dv.StatusCode.value for dv in dvs]
+        values = [dv.Value.Value if dv.Value is not None else None for dv in dvs]
+        if self.values.dtype != object and any(val is None or dv.Value.VariantType != self.vtype for dv, val in zip(dvs, values)):
+            # None values of bad samples would silently become nan or False,
+            # and values of another type would be cast without error, for example float to int
+            self._use_objects()
+        try:
+            self.values[start:stop] = values
+        except (TypeError, ValueError, OverflowError):
+            # arrays or type changes
+            self._use_objects()
+            self.values[start:stop] = values
+        self._size = stop
+
+    def _use_objects(self):
+        logger.info("History values do not fit in a %s column, using objects", self.values.dtype)
+        self.values = self.values.astype(object)
+
+    def timestamp_to_string(self, row):
+        if np is None:
+            return val_to_string(self.timestamps[row])
+        ts = self.timestamps[row]
+        if np.isnat(ts):
+            return "None"
+        return str(ts)
+
+    def value_to_string(self, row):
+        val = self.values[row]
+        if np is not None and isinstance(val, np.generic):
+            return str(val)
+        return val_to_string(val)
+
+    def status(self, row):
+        return ua.StatusCode(int(self.statuses[row]))
+
+
+class HistoryModel(QAbstractTableModel):
+    """
+    Model reading the raw history of a variable with HistoryRead.
+    Pages of at most page_size values are read when the view asks for more rows,
+    following the continuation points returned by the server
+    """
+
+    error = pyqtSignal(Exception)
+
+    def __init__(self, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.node = None
+        self.page_size = PAGE_SIZE
+        self.columns = HistoryColumns()
+        self._details = None
+        self._continuation_point = None
+        self._finished = True
+
+    def set_node(self, node, starttime=None, endtime=None, page_size=PAGE_SIZE):
+        self.release()
+        self.beginResetModel()
+        self.node = node
+        self.page_size = page_size
+        self.columns = HistoryColumns()
+        self._continuation_point = None
+        self._finished = node is None
+        if node is not None:
+            details = ua.ReadRawModifiedDetails()
+            details.IsReadModified = False
+            details.StartTime = starttime if starttime else ua.get_win_epoch()
+            details.EndTime = endtime if endtime else ua.get_win_epoch()
+            details.NumValuesPerNode = page_size
+            details.ReturnBounds = False
+            self._details = details
+        self.endResetModel()
+        if node is not None:
+            self.fetchMore(QModelIndex())
+
+    def release(self):
+        """
+        tell the server we will not read remaining pages
+        """
+        if self._continuation_point is None:
+            return
+        valueid = ua.HistoryReadValueId()
+        valueid.NodeId = self.node.nodeid
+        valueid.ContinuationPoint = self._continuation_point
+        params = ua.HistoryReadParameters()
+        params.HistoryReadDetails = self._details
+        params.TimestampsToReturn = ua.TimestampsToReturn.Both
+        params.ReleaseContinuationPoints = True
+        params.NodesToRead.append(valueid)
+        self._continuation_point = None
+        self._finished = True
+        try:
+            call_service(self.node, "history_read", params)
+        except Exception:
+            logger.warning("Could not release history continuation point of %s", self.node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 3
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ("Source Timestamp", "Value", "Status")[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def data(self, idx, role=Qt.DisplayRole):
+        if not idx.isValid():
+            return None
+        row = idx.row()
+        if role == Qt.DisplayRole:
+            if idx.column() == 0:
+                return self.columns.timestamp_to_string(row)
+            elif idx.column() == 1:
+                return self.columns.value_to_string(row)
+            return self.columns.status(row).name
+        if role == Qt.ForegroundRole and not self.columns.status(row).is_good():
+            return QColor("gray")
+        return None
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self._finished
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self._finished:
+            return
+        try:
+            result = self.node.history_read(self._details, self._continuation_point)
+            result.StatusCode.check()
+        except Exception as ex:
+            logger.exception("Error reading history of %s", self.node)
+            self._finished = True
+            self._continuation_point = None
+            self.error.emit(ex)
+            return
+        dvs = result.HistoryData.DataValues if result.HistoryData else []
+        previous = self._continuation_point
+        self._continuation_point = result.ContinuationPoint
+        if not self._continuation_point or self._continuation_point == previous:
+            # last page, or server not making progress
+            self._continuation_point = None
+            self._finished = True
+        if not dvs:
+            return
+        if not len(self.columns):
+            self.columns = HistoryColumns(dvs[0].Value.VariantType if dvs[0].Value is not None else None)
+        start = len(self.columns)
+        self.beginInsertRows(QModelIndex(), start, start + len(dvs) - 1)
+        self.columns.append(dvs)
+        self.endInsertRows()
+        logger.info("Read %s history values of %s, %s in total", len(dvs), self.node, len(self.columns))
+
+
+class HistoryWidget(QObject):
+    """
+    Show the raw history of a variable in a table,
+    values are read from the server page by page while scrolling
+    """
+
+    error = pyqtSignal(Exception)
+
+    def __init__(self, view, page_size=PAGE_SIZE):
+        QObject.__init__(self, view)
+        self.view = view
+        self.page_size = page_size
+        self.model = HistoryModel(self)
+        self.model.error.connect(self.error.emit)
+        self.view.setModel(self.model)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.settings = QSettings()
+        state = self.settings.value("WindowState/history_widget_state", None)
+        if state is not None:
+            self.view.horizontalHeader().restoreState(state)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.node = None
+        self.starttime = None
+        self.endtime = None
+
+        self.reloadAction = QAction("Reload", self)
+        self.reloadAction.triggered.connect(self.reload)
+        copyaction = QAction("&Copy Value", self)
+        copyaction.triggered.connect(self._copy_value)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.showContextMenu)
+        self._contextMenu = QMenu()
+        self._contextMenu.addAction(self.reloadAction)
+        self._contextMenu.addAction(copyaction)
+
+    def save_state(self):
+        self.settings.setValue("WindowState/history_widget_state", self.view.horizontalHeader().saveState())
+
+    def showContextMenu(self, position):
+        if self.node is not None:
+            self._contextMenu.exec_(self.view.viewport().mapToGlobal(position))
+
+    def _copy_value(self):
+        idx = self.view.currentIndex()
+        if idx.isValid():
+            QApplication.clipboard().setText(idx.data())
+
+    def clear(self):
+        self.node = None
+        self.model.set_node(None)
+
+    @trycatchslot
+    def reload(self):
+        self.show_history(self.node, self.starttime, self.endtime)
+
+    def show_history(self, node, starttime=None, endtime=None):
+        """
+        show history of node between starttime and endtime, by default all history
+        """
+        self.node = node
+        self.starttime = starttime
+        self.endtime = endtime
+        self.model.set_node(node, starttime, endtime, self.page_size)
@@ -0,0 +1,299 @@
+"""
+Read and write parts of large array values using the IndexRange
+of ReadValueId and WriteValue
+"""
+import logging
+
+from asyncua import ua
+
+
+logger = logging.getLogger(__name__)
+
+# arrays whose estimated size in bytes is above this are not read completely
+MAX_VALUE_BYTES = 1024 * 1024
+
+VARIANT_TYPE_SIZES = {
+    ua.VariantType.Boolean: 1,
+    ua.VariantType.SByte: 1,
+    ua.VariantType.Byte: 1,
+    ua.VariantType.Int16: 2,
+    ua.VariantType.UInt16: 2,
+    ua.VariantType.Int32: 4,
+    ua.VariantType.UInt32: 4,
+    ua.VariantType.Int64: 8,
+    ua.VariantType.UInt64: 8,
+    ua.VariantType.Float: 4,
+    ua.VariantType.Double: 8,
+    ua.VariantType.DateTime: 8,
+    ua.VariantType.Guid: 16,
+    ua.VariantType.ByteString: 1,  # elements of a scalar ByteString are bytes
+}
+# used for strings, structures and other types of variable size
+DEFAULT_ELEMENT_SIZE = 16
+
+# status codes returned by servers not able to write a range of an array
+INDEX_RANGE_WRITE_REJECTED = (
+    ua.StatusCodes.BadWriteNotSupported,
+    ua.StatusCodes.BadIndexRangeInvalid,
+    ua.StatusCodes.BadNotSupported,
+)
+
+
+class IndexRangeNotSupported(ua.UaError):
+    pass
+
+
+def index_range(start, stop):
+    """
+    return the NumericRange string for elements start to stop-1
+    """
+    if stop - start == 1:
+        return str(start)
+    return "{}:{}".format(start, stop - 1)
+
+
+def changed_range(old, new):
+    """
+    return (start, stop) of the contiguous elements containing all differences
+    between one dimensional lists old and new of the same length,
+    None if they cannot be compared element by element or are equal
+    """
+    if not isinstance(old, list) or not isinstance(new, list) or len(old) != len(new):
+        return None
+    if any(isinstance(val, list) for val in old + new):
+        return None
+    changed = [idx for idx, (val, new_val) in enumerate(zip(old, new)) if val != new_val]
+    if not changed:
+        return None
+    return changed[0], changed[-1] + 1
+
+
+def read_range(node, start, stop, attr=ua.AttributeIds.Value):
+    """
+    read elements start to stop-1 of an array attribute, return a DataValue
+    """
+    rv = ua.ReadValueId()
+    rv.NodeId = node.nodeid
+    rv.AttributeId = attr
+    rv.IndexRange = index_range(start, stop)
+    params = ua.ReadParameters()
+    params.NodesToRead.append(rv)
+    return node.read_params(params)[0]
+
+
+def range_variant(values, uatype):
+    """
+    return the Variant of elements of an array attribute,
+    elements of a ByteString are integers and are written as a ByteString
+    """
+    if uatype == ua.VariantType.ByteString and all(isinstance(val, int) for val in values):
+        return ua.Variant(bytes(values), uatype)
+    return ua.Variant(list(values), uatype)
+
+
+def write_range(node, start, values, uatype, attr=ua.AttributeIds.Value):
+    """
+    write values to elements start to start+len(values)-1 of an array attribute
+    return the StatusCode of the write
+    """
+    wv = ua.WriteValue()
+    wv.NodeId = node.nodeid
+    wv.AttributeId = attr
+    wv.IndexRange = index_range(start, start + len(values))
+    wv.Value = ua.DataValue(range_variant(values, uatype))
+    params = ua.WriteParameters()
+    params.NodesToWrite.append(wv)
+    return node.write_params(params)[0]
+
+
+def supports_index_range(node, attr=ua.AttributeIds.Value):
+    """
+    check with a one element read that the server honors IndexRange for an array attribute.
+    Some servers ignore IndexRange and would replace the whole array when writing a range
+    """
+    dv = read_range(node, 0, 1, attr)
+    if not dv.StatusCode.is_good():
+        return False
+    values = dv.Value.Value
+    return isinstance(values, (list, bytes)) and len(values) == 1
+
+
+def _has_element(node, idx, attr):
+    dv = read_range(node, idx, idx + 1, attr)
+    if dv.StatusCode.value in (ua.StatusCodes.BadIndexRangeNoData, ua.StatusCodes.BadIndexRangeInvalid):
+        return False
+    dv.StatusCode.check()
+    if len(dv.Value.Value) != 1:
+        raise IndexRangeNotSupported("Server ignored IndexRange {} of {}".format(idx, node))
+    return True
+
+
+def probe_length(node, known, attr=ua.AttributeIds.Value):
+    """
+    find the length of an array value having at least known + 1 elements
+    using single element reads
+    """
+    low = known
+    high = known * 2 + 1
+    while _has_element(node, high, attr):
+        low = high
+        high = high * 2 + 1
+    while high - low > 1:
+        mid = (low + high) // 2
+        if _has_element(node, mid, attr):
+            low = mid
+        else:
+            high = mid
+    return low + 1
+
+
+def _get_variant_type(dtype):
+    if dtype.NamespaceIndex == 0 and isinstance(dtype.Identifier, int):
+        try:
+            return ua.VariantType(dtype.Identifier)
+        except ValueError:
+            pass
+    return None
+
+
+def _is_one_dimension(value_rank):
+    return value_rank in (ua.ValueRank.ScalarOrOneDimension, ua.ValueRank.Any, ua.ValueRank.OneOrMoreDimensions, ua.ValueRank.OneDimension)
+
+
+def _max_elements(vtype, max_bytes):
+    return max(max_bytes // VARIANT_TYPE_SIZES.get(vtype, DEFAULT_ELEMENT_SIZE), 1)
+
+
+def first_elements(max_bytes=MAX_VALUE_BYTES):
+    """
+    number of elements of a value read before its data type is known,
+    they are never more than max_bytes whatever their type
+    """
+    return _max_elements(None, max_bytes)
+
+
+def value_may_exceed(value_rank, dtype, array_dims, max_bytes=MAX_VALUE_BYTES):
+    """
+    False if ValueRank, DataType and ArrayDimensions of a variable show
+    that its value is never read partially by read_value_bounded
+    """
+    vtype = _get_variant_type(dtype)
+    if not max_bytes or not (_is_one_dimension(value_rank) or vtype == ua.VariantType.ByteString):
+        return False
+    if array_dims and len(array_dims) == 1 and 0 < array_dims[0] <= _max_elements(vtype, max_bytes):
+        return False
+    return True
+
+
+def read_value_bounded(node, value_rank, dtype, array_dims, max_bytes=MAX_VALUE_BYTES, first=None):
+    """
+    read the Value attribute of a variable but do not read more than max_bytes
+    of one dimensional arrays and ByteStrings.
+    If the value is larger, the returned DataValue contains an IndexRangeArray
+    reading elements from the server when they are accessed.
+    first is the DataValue of the Value already read with the IndexRange of
+    elements 0 to first_elements(max_bytes), it is returned if it is complete
+    """
+    first_count = first_elements(max_bytes)
+    if first is not None and first.StatusCode.is_good():
+        values = first.Value.Value
+        # one more element than asked means the value is larger, anything else is complete
+        if not isinstance(values, (list, bytes, str)) or len(values) != first_count + 1:
+            return first
+    if not value_may_exceed(value_rank, dtype, array_dims, max_bytes):
+        return node.read_attributes([ua.AttributeIds.Value])[0]
+    vtype = _get_variant_type(dtype)
+    max_elements = _max_elements(vtype, max_bytes)
+    if first is not None and not first.StatusCode.is_good():
+        # scalar, empty array or IndexRange not supported, read everything
+        return node.read_attributes([ua.AttributeIds.Value])[0]
+    if first is not None and max_elements == first_count:
+        dv = first
+    else:
+        # read one element more than allowed to know if the array is larger
+        dv = read_range(node, 0, max_elements + 1)
+    if not dv.StatusCode.is_good():
+        return node.read_attributes([ua.AttributeIds.Value])[0]
+    values = dv.Value.Value
+    if not isinstance(values, (list, bytes)) or len(values) <= max_elements:
+        return dv
+    if len(values) > max_elements + 1:
+        # server ignored our IndexRange and sent everything anyway
+        return dv
+    if array_dims and len(array_dims) == 1 and array_dims[0] > 0:
+        length = array_dims[0]
+    else:
+        try:
+            length = probe_length(node, max_elements)
+        except IndexRangeNotSupported:
+            logger.warning("Server does not support IndexRange reads, reading complete value of %s", node)
+            return node.read_attributes([ua.AttributeIds.Value])[0]
+    logger.info("Value of %s has %s elements, it will be read on demand", node, length)
+    if isinstance(values, bytes):
+        uatype = ua.VariantType.Byte
+    else:
+        uatype = dv.Value.VariantType
+    dv.Value = ua.Variant(IndexRangeArray(node, length, uatype, values), dv.Value.VariantType)
+    return dv
+
+
+class IndexRangeArray(object):
+    """
+    Sequence of the elements of a large array value,
+    element ranges are read from the server when accessed.
+    Setting elements only updates the local copy, use write_range to write them
+    """
+
+    def __init__(self, node, length, uatype, first_values=None, attr=ua.AttributeIds.Value):
+        self.node = node
+        self.uatype = uatype
+        self.attr = attr
+        self._length = length
+        # keep last read range to avoid reading the same elements again
+        self._cache_start = 0
+        self._cache = first_values if first_values is not None else []
+
+    def __len__(self):
+        return self._length
+
+    def to_string(self):
+        return "{} elements, read on demand".format(self._length)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                raise ValueError("IndexRangeArray does not support slice steps")
+            return self.read(start, stop)
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("IndexRangeArray index out of range")
+        return self.read(key, key + 1)[0]
+
+    def __setitem__(self, key, values):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(self._length)
+        else:
+            start, stop, values = key, key + 1, [values]
+        cache_stop = self._cache_start + len(self._cache)
+        if self._cache_start <= start and stop <= cache_stop:
+            cache = list(self._cache)
+            cache[start - self._cache_start:stop - self._cache_start] = values
+            self._cache = bytes(cache) if isinstance(self._cache, bytes) else cache
+
+    def read(self, start, stop):
+        if start >= stop:
+            return self._cache[:0]
+        cache_stop = self._cache_start + len(self._cache)
+        if self._cache_start <= start and stop <= cache_stop:
+            return self._cache[start - self._cache_start:stop - self._cache_start]
+        dv = read_range(self.node, start, stop, self.attr)
+        dv.StatusCode.check()
+        values = dv.Value.Value
+        if len(values) > stop - start:
+            # server ignored IndexRange and sent everything
+            values = values[start:stop]
+        self._cache_start = start
+        self._cache = values
+        return values
@@ -0,0 +1,314 @@
+"""
+Caches of node information shared by the widgets
+"""
+import logging
+import weakref
+
+from asyncua import ua
+from asyncua.sync import new_node
+
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCache(object):
+    """
+    Base of caches keeping a dict per session,
+    entries are dropped with the session
+    """
+
+    def __init__(self):
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def _get(self, node):
+        """
+        return the dict of the session of node
+        """
+        session = node.aio_obj.session
+        values = self._sessions.get(session)
+        if values is None:
+            values = {}
+            self._sessions[session] = values
+        return values
+
+    def clear(self):
+        self._sessions = weakref.WeakKeyDictionary()
+
+
+class NodeNameCache(SessionCache):
+    """
+    Cache of BrowseName, DisplayName and NodeClass of nodes, per session.
+    Names of standard nodes are known without asking the server,
+    other nodes are resolved in one Read request by prefetch()
+    """
+
+    @staticmethod
+    def _is_standard(nodeid):
+        return nodeid.NamespaceIndex == 0 and nodeid.Identifier in ua.ObjectIdNames
+
+    def prefetch(self, node, nodeids):
+        """
+        read names of all nodeids not already known using one Read request
+        node is any node of the session, it is used to send the request
+        """
+        names = self._get(node)
+        missing = []
+        for nodeid in nodeids:
+            if nodeid.is_null() or self._is_standard(nodeid) or nodeid in names or nodeid in missing:
+                continue
+            missing.append(nodeid)
+        if missing:
+            self._read(node, names, missing)
+
+    @staticmethod
+    def _read(node, names, nodeids):
+        params = ua.ReadParameters()
+        for nodeid in nodeids:
+            for attr in (ua.AttributeIds.BrowseName, ua.AttributeIds.DisplayName, ua.AttributeIds.NodeClass):
+                rv = ua.ReadValueId()
+                rv.NodeId = nodeid
+                rv.AttributeId = attr
+                params.NodesToRead.append(rv)
+        logger.info("Reading names of %s nodes", len(nodeids))
+        results = node.read_params(params)
+        for idx, nodeid in enumerate(nodeids):
+            bname, dname, nclass = results[3 * idx:3 * idx + 3]
+            if bname.StatusCode.is_good():
+                names[nodeid] = (bname.Value.Value,
+                                 dname.Value.Value if dname.StatusCode.is_good() else None,
+                                 ua.NodeClass(nclass.Value.Value) if nclass.StatusCode.is_good() else ua.NodeClass.Unspecified)
+            else:
+                # remember that there is nothing to find
+                names[nodeid] = (None, None, ua.NodeClass.Unspecified)
+
+    def get_names(self, node, nodeid):
+        """
+        return BrowseName and DisplayName of nodeid, None if they cannot be found
+        """
+        if self._is_standard(nodeid):
+            name = ua.ObjectIdNames[nodeid.Identifier]
+            return ua.QualifiedName(name, 0), ua.LocalizedText(name)
+        if nodeid.is_null():
+            return None, None
+        names = self._get(node)
+        if nodeid not in names:
+            self.prefetch(node, [nodeid])
+        return names[nodeid][:2]
+
+    def get_node_class(self, node, nodeid):
+        """
+        return NodeClass of nodeid, Unspecified if it cannot be found
+        """
+        if nodeid.is_null():
+            return ua.NodeClass.Unspecified
+        names = self._get(node)
+        if nodeid not in names:
+            # also read for standard nodes, only their names are known
+            self._read(node, names, [nodeid])
+        return names[nodeid][2]
+
+    def get_browse_name(self, node, nodeid):
+        """
+        return BrowseName of nodeid as string, or nodeid as string if it cannot be found
+        """
+        if self._is_standard(nodeid):
+            return ua.ObjectIdNames[nodeid.Identifier]
+        if nodeid.is_null():
+            return nodeid.to_string()
+        names = self._get(node)
+        if nodeid not in names:
+            self.prefetch(node, [nodeid])
+        bname = names[nodeid][0]
+        if bname is None:
+            return nodeid.to_string()
+        return bname.to_string()
+
+    def get_display_name(self, node, nodeid):
+        """
+        return DisplayName text of nodeid, or its BrowseName if there is no DisplayName
+        """
+        if not self._is_standard(nodeid) and not nodeid.is_null():
+            names = self._get(node)
+            if nodeid not in names:
+                self.prefetch(node, [nodeid])
+            dname = names[nodeid][1]
+            if dname is not None and dname.Text:
+                return dname.Text
+        return self.get_browse_name(node, nodeid)
+
+    def forget(self, node, nodeid):
+        """
+        remove nodeid from cache, for example after it has been renamed
+        """
+        self._get(node).pop(nodeid, None)
+
+
+# cache shared by all widgets
+name_cache = NodeNameCache()
+
+
+class OperationLimitsCache(SessionCache):
+    """
+    Cache of the OperationLimits of the servers, per session
+    """
+
+    def get(self, node, limit_id):
+        """
+        return value of an OperationLimits variable such as
+        ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead
+        0 is returned if the server does not define a limit
+        """
+        limits = self._get(node)
+        if limit_id not in limits:
+            rv = ua.ReadValueId()
+            rv.NodeId = ua.NodeId(limit_id)
+            rv.AttributeId = ua.AttributeIds.Value
+            params = ua.ReadParameters()
+            params.NodesToRead.append(rv)
+            dv = node.read_params(params)[0]
+            if dv.StatusCode.is_good() and dv.Value.Value:
+                limits[limit_id] = dv.Value.Value
+            else:
+                limits[limit_id] = 0
+        return limits[limit_id]
+
+
+operation_limits = OperationLimitsCache()
+
+
+class DataTypeCache(SessionCache):
+    """
+    Cache of the VariantType used to encode values of a DataType, per session.
+    Standard base types are resolved without asking the server, for other
+    types the supertypes are browsed once and remembered
+    """
+
+    @staticmethod
+    def _base_variant_type(nodeid):
+        # same rules as asyncua data_type_to_variant_type
+        if nodeid.Identifier == ua.ObjectIds.Enumeration:
+            return ua.VariantType.Int32
+        if nodeid.Identifier in (ua.ObjectIds.BaseDataType, ua.ObjectIds.Number, ua.ObjectIds.Integer, ua.ObjectIds.UInteger):
+            return ua.VariantType.Variant
+        return ua.VariantType(nodeid.Identifier)
+
+    @staticmethod
+    def _is_base(nodeid):
+        return nodeid.NamespaceIndex == 0 and isinstance(nodeid.Identifier, int) and nodeid.Identifier < 30
+
+    def get_variant_type(self, node, dtype):
+        """
+        return the VariantType of values of DataType dtype
+        node is any node of the session, it is used to send requests
+        """
+        if self._is_base(dtype):
+            return self._base_variant_type(dtype)
+        types = self._get(node)
+        path = []
+        nodeid = dtype
+        while nodeid not in types and not self._is_base(nodeid):
+            path.append(nodeid)
+            refs = new_node(node, nodeid).get_references(refs=ua.ObjectIds.HasSubtype, direction=ua.BrowseDirection.Inverse)
+            if not refs:
+                raise ua.UaError("Datatype must be a subtype of builtin types {}".format(dtype))
+            nodeid = refs[0].NodeId
+        if nodeid in types:
+            vtype = types[nodeid]
+        else:
+            vtype = self._base_variant_type(nodeid)
+        for subtype in path:
+            types[subtype] = vtype
+        return vtype
+
+
+data_type_cache = DataTypeCache()
+
+
+class MethodSignature(object):
+    """
+    Object a method is called on, its input and output Arguments
+    and the VariantTypes of the input arguments.
+    arguments are the NodeIds of the InputArguments and OutputArguments properties
+    """
+
+    def __init__(self, parent, inputs, outputs, input_types, arguments=()):
+        self.parent = parent
+        self.inputs = inputs
+        self.outputs = outputs
+        self.input_types = input_types
+        self.arguments = list(arguments)
+
+
+class MethodSignatureCache(SessionCache):
+    """
+    Cache of the signatures of methods, per session.
+    A signature is read with one Browse request for the parent and the
+    argument properties and one Read request for the arguments
+    """
+
+    def get(self, node):
+        """
+        return MethodSignature of method node
+        """
+        signatures = self._get(node)
+        if node.nodeid not in signatures:
+            signatures[node.nodeid] = self._read(node)
+        return signatures[node.nodeid]
+
+    def forget(self, node):
+        self._get(node).pop(node.nodeid, None)
+
+    def forget_arguments(self, node, nodeid):
+        """
+        remove signatures of methods whose InputArguments or OutputArguments
+        property is nodeid, for example after its Value has been written
+        """
+        signatures = self._get(node)
+        for method, signature in list(signatures.items()):
+            if nodeid in signature.arguments:
+                logger.info("Arguments of method %s changed", method)
+                del signatures[method]
+
+    @staticmethod
+    def _browse_description(node, reftype, direction):
+        desc = ua.BrowseDescription()
+        desc.NodeId = node.nodeid
+        desc.BrowseDirection = direction
+        desc.ReferenceTypeId = ua.NodeId(reftype)
+        desc.IncludeSubtypes = True
+        desc.NodeClassMask = ua.NodeClass.Unspecified
+        desc.ResultMask = ua.BrowseResultMask.BrowseName
+        return desc
+
+    def _read(self, node):
+        logger.info("Reading signature of method %s", node)
+        params = ua.BrowseParameters()
+        params.View.Timestamp = ua.get_win_epoch()
+        params.NodesToBrowse.append(self._browse_description(node, ua.ObjectIds.HierarchicalReferences, ua.BrowseDirection.Inverse))
+        params.NodesToBrowse.append(self._browse_description(node, ua.ObjectIds.HasProperty, ua.BrowseDirection.Forward))
+        parents, props = node.tloop.post(node.aio_obj.session.browse(params))
+        parents.StatusCode.check()
+        props.StatusCode.check()
+        if not parents.References:
+            raise ua.UaError("Method {} has no parent to call it on".format(node))
+        parent = parents.References[0].NodeId
+        # properties are standard, match BrowseName without namespace
+        args = {ref.BrowseName.Name: ref.NodeId for ref in props.References if ref.BrowseName.Name in ("InputArguments", "OutputArguments")}
+        names = [name for name in ("InputArguments", "OutputArguments") if name in args]
+        values = {}
+        if names:
+            read = ua.ReadParameters()
+            for name in names:
+                rv = ua.ReadValueId()
+                rv.NodeId = args[name]
+                rv.AttributeId = ua.AttributeIds.Value
+                read.NodesToRead.append(rv)
+            for name, dv in zip(names, node.read_params(read)):
+                dv.StatusCode.check()
+                values[name] = dv.Value.Value or []
+        inputs = values.get("InputArguments", [])
+        input_types = [data_type_cache.get_variant_type(node, arg.DataType) for arg in inputs]
+        return MethodSignature(parent, inputs, values.get("OutputArguments", []), input_types, args.values())
+
+
+method_signatures = MethodSignatureCache()
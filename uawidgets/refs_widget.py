@@ -1,40 +1,251 @@
+import copy
 import logging
 
-from PyQt5.QtCore import pyqtSignal, QObject, QSettings, Qt
-from PyQt5.QtGui import QStandardItemModel, QStandardItem
-from PyQt5.QtWidgets import QMenu, QAction, QStyledItemDelegate, QAbstractItemView
+from PyQt5.QtCore import pyqtSignal, QObject, QSettings, Qt, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import QMenu, QAction, QStyledItemDelegate, QAbstractItemView, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QComboBox, QDialogButtonBox, QGroupBox
 
 from asyncua import ua
 from asyncua.sync import SyncNode, new_node
 
-from uawidgets.utils import trycatchslot
-from uawidgets.get_node_dialog import GetNodeTextButton
+from uawidgets.utils import trycatchslot, call_service
+from uawidgets.get_node_dialog import GetNodeTextButton, GetNodeButton
+from uawidgets.node_cache import name_cache
+from uawidgets.attrs_widget import PENDING_COLOR, GOOD_COLOR, BAD_COLOR
 
 
 logger = logging.getLogger(__name__)
 
+# number of references asked to the server in one Browse or BrowseNext request
+PAGE_SIZE = 500
+
+COLUMNS = ("ReferenceType", "NodeId", "BrowseName", "TypeDefinition", "DisplayName", "NodeClass")
+# columns of target details, hidden by default
+DETAIL_COLUMNS = (4, 5)
+
+
+class RefsModel(QAbstractTableModel):
+    """
+    Model of the references of a node.
+    References are browsed page by page using RequestedMaxReferencesPerNode and BrowseNext
+    when the view needs more rows, row texts are only formatted when displayed
+    """
+
+    error = pyqtSignal(Exception)
+
+    def __init__(self, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.node = None
+        self.page_size = PAGE_SIZE
+        self.refs = []
+        self._continuation_point = None
+        # background color and tooltip of rows of staged or committed edits, by id of reference
+        self._states = {}
+        # references of staged removals, not shown when browsed again
+        self.hidden = []
+        # filter sent to the server in the BrowseDescription
+        self.reference_type = ua.NodeId(ua.ObjectIds.References)
+        self.include_subtypes = True
+        self.direction = ua.BrowseDirection.Forward
+        self.nodeclass_mask = ua.NodeClass.Unspecified
+
+    def _browse_description(self, node):
+        desc = ua.BrowseDescription()
+        desc.NodeId = node.nodeid
+        desc.BrowseDirection = self.direction
+        desc.ReferenceTypeId = self.reference_type
+        desc.IncludeSubtypes = self.include_subtypes
+        desc.NodeClassMask = self.nodeclass_mask
+        desc.ResultMask = ua.BrowseResultMask.All
+        return desc
+
+    def browse(self, node):
+        """
+        show references of node, only the first page is read
+        """
+        self.release()
+        self.beginResetModel()
+        self.node = node
+        self.refs = []
+        self._states = {}
+        self.endResetModel()
+        if node is None:
+            return
+        params = ua.BrowseParameters()
+        params.View.Timestamp = ua.get_win_epoch()
+        params.RequestedMaxReferencesPerNode = self.page_size
+        params.NodesToBrowse.append(self._browse_description(node))
+        self._add_result(call_service(node, "browse", params)[0])
+
+    def release(self):
+        """
+        tell the server we will not ask for remaining references
+        """
+        if self._continuation_point is None:
+            return
+        params = ua.BrowseNextParameters()
+        params.ReleaseContinuationPoints = True
+        params.ContinuationPoints = [self._continuation_point]
+        self._continuation_point = None
+        try:
+            call_service(self.node, "browse_next", params)
+        except Exception:
+            logger.warning("Could not release browse continuation point of %s", self.node)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._continuation_point is not None
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self._continuation_point is None:
+            return
+        params = ua.BrowseNextParameters()
+        params.ReleaseContinuationPoints = False
+        params.ContinuationPoints = [self._continuation_point]
+        self._continuation_point = None
+        try:
+            self._add_result(call_service(self.node, "browse_next", params)[0])
+        except Exception as ex:
+            logger.exception("Error browsing next references of %s", self.node)
+            self.error.emit(ex)
+
+    def _add_result(self, result):
+        result.StatusCode.check()
+        self._continuation_point = result.ContinuationPoint or None
+        refs = result.References
+        logger.info("Browsed %s references of %s, more: %s", len(refs), self.node, self._continuation_point is not None)
+        if self.hidden:
+            hidden = {_ref_key(ref) for ref in self.hidden}
+            refs = [ref for ref in refs if _ref_key(ref) not in hidden]
+        if not refs:
+            return
+        # resolve names of non standard reference types and type definitions of the page in one request
+        nodeids = [ref.ReferenceTypeId for ref in refs] + [ref.TypeDefinition for ref in refs]
+        try:
+            name_cache.prefetch(self.node, nodeids)
+        except Exception:
+            logger.exception("Could not read names of reference types and type definitions")
+        self.append_refs(refs)
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or row < 0 or row + count > len(self.refs):
+            return False
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for ref in self.refs[row:row + count]:
+            self._states.pop(id(ref), None)
+        del self.refs[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def append_refs(self, refs):
+        start = len(self.refs)
+        self.beginInsertRows(QModelIndex(), start, start + len(refs) - 1)
+        self.refs.extend(refs)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.refs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def flags(self, idx):
+        flags = QAbstractTableModel.flags(self, idx)
+        if idx.column() < 2:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, idx, role=Qt.DisplayRole):
+        if not idx.isValid():
+            return None
+        ref = self.refs[idx.row()]
+        if role == Qt.UserRole:
+            return ref
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self._ref_text(ref, idx.column())
+        if id(ref) in self._states:
+            if role == Qt.BackgroundRole:
+                return self._states[id(ref)][0]
+            if role == Qt.ToolTipRole:
+                return self._states[id(ref)][1]
+        return None
+
+    def set_ref_state(self, ref, color, tooltip=None):
+        """
+        set background color and tooltip of the row of ref
+        """
+        self._states[id(ref)] = (color, tooltip)
+        for row, other in enumerate(self.refs):
+            if other is ref:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def setData(self, idx, value, role=Qt.EditRole):
+        if not idx.isValid():
+            return False
+        if role == Qt.UserRole:
+            self.refs[idx.row()] = value
+        # texts are computed from the reference
+        self.dataChanged.emit(idx.sibling(idx.row(), 0), idx.sibling(idx.row(), len(COLUMNS) - 1))
+        return True
+
+    def _ref_text(self, ref, column):
+        if column == 0:
+            return name_cache.get_browse_name(self.node, ref.ReferenceTypeId)
+        elif column == 1:
+            nodeid = ref.NodeId.to_string()
+            if ref.NodeId.NamespaceIndex == 0 and ref.NodeId.Identifier in ua.ObjectIdNames:
+                nodeid += ": " + ua.ObjectIdNames[ref.NodeId.Identifier]
+            return nodeid
+        elif column == 2:
+            return ref.BrowseName.to_string()
+        elif column == 3:
+            return name_cache.get_browse_name(self.node, ref.TypeDefinition)
+        elif column == 4:
+            return ref.DisplayName.Text
+        return ref.NodeClass.name
+
 
 class RefsWidget(QObject):
 
     error = pyqtSignal(Exception)
     reference_changed = pyqtSignal(SyncNode)
+    # number of staged reference edits of all nodes
+    staged_count_changed = pyqtSignal(int)
 
-    def __init__(self, view):
+    def __init__(self, view, verify_delay=None):
         self.view = view
         QObject.__init__(self, view)
-        self.model = QStandardItemModel()
+        # rows are updated after each edit, if verify_delay is set references are browsed
+        # again verify_delay milliseconds after the last edit
+        self.verify_delay = verify_delay
+        self._verify_timer = QTimer(self)
+        self._verify_timer.setSingleShot(True)
+        self._verify_timer.timeout.connect(self.reload)
+        self.model = RefsModel(self)
+        self.model.error.connect(self.error.emit)
+        # when staging, edits are collected and sent by commit_staged()
+        # in one DeleteReferences and one AddReferences request
+        self.staging = False
+        self._staged_deletes = []
+        self._staged_adds = []
+        # staged edits of other nodes by nodeid, kept until committed or discarded
+        self._stashed = {}
 
         delegate = MyDelegate(self.view, self)
         delegate.error.connect(self.error.emit)
-        delegate.reference_changed.connect(self.reference_changed.emit)
         self.view.setEditTriggers(QAbstractItemView.DoubleClicked)
         self.view.setModel(self.model)
         self.view.setItemDelegate(delegate)
         self.settings = QSettings()
-        self.model.setHorizontalHeaderLabels(['ReferenceType', 'NodeId', "BrowseName", "TypeDefinition"])
         state = self.settings.value("WindowState/refs_widget_state", None)
-        if state is not None:
-            self.view.horizontalHeader().restoreState(state)
+        if state is None or not self.view.horizontalHeader().restoreState(state):
+            for column in DETAIL_COLUMNS:
+                self.view.setColumnHidden(column, True)
         self.view.horizontalHeader().setSectionResizeMode(0)
         self.view.horizontalHeader().setStretchLastSection(True)
         self.node = None
@@ -45,14 +256,35 @@ class RefsWidget(QObject):
         self.addRefAction.triggered.connect(self.add_ref)
         self.removeRefAction = QAction("Remove Reference", self.model)
         self.removeRefAction.triggered.connect(self.remove_ref)
+        self.filterAction = QAction("Filter References...", self.model)
+        self.filterAction.triggered.connect(self.edit_filter)
+        self.detailsAction = QAction("Show Target Details", self.model)
+        self.detailsAction.setCheckable(True)
+        self.detailsAction.setChecked(not self.view.isColumnHidden(DETAIL_COLUMNS[0]))
+        self.detailsAction.toggled.connect(self.show_details)
+        self.stageAction = QAction("Stage Edits", self.model)
+        self.stageAction.setCheckable(True)
+        self.stageAction.toggled.connect(self.set_staging)
+        self.commitAction = QAction("Commit Staged Edits", self.model)
+        self.commitAction.triggered.connect(self.commit_staged)
+        self.discardAction = QAction("Discard Staged Edits", self.model)
+        self.discardAction.triggered.connect(self.discard_staged)
+        self.commitAction.setEnabled(False)
+        self.discardAction.setEnabled(False)
 
         self.view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.view.customContextMenuRequested.connect(self.showContextMenu)
         self._contextMenu = QMenu()
         self._contextMenu.addAction(self.reloadAction)
+        self._contextMenu.addAction(self.filterAction)
+        self._contextMenu.addAction(self.detailsAction)
         self._contextMenu.addSeparator()
         self._contextMenu.addAction(self.addRefAction)
         self._contextMenu.addAction(self.removeRefAction)
+        self._contextMenu.addSeparator()
+        self._contextMenu.addAction(self.stageAction)
+        self._contextMenu.addAction(self.commitAction)
+        self._contextMenu.addAction(self.discardAction)
 
     def showContextMenu(self, position):
         if not self.node:
@@ -64,10 +296,34 @@ class RefsWidget(QObject):
         self._contextMenu.exec_(self.view.viewport().mapToGlobal(position))
 
     def clear(self):
-        # remove all rows but not header!!
-        self.model.removeRows(0, self.model.rowCount())
+        self._verify_timer.stop()
+        self._stash_staged()
+        self.model.hidden = []
+        self.model.browse(None)
         self.node = None
 
+    def _stash_staged(self):
+        if self.node is None or not (self._staged_deletes or self._staged_adds):
+            return
+        # rows are recreated when node is shown again
+        logger.info("Keeping %s staged reference edits of node %s", len(self._staged_deletes) + len(self._staged_adds), self.node)
+        self._stashed[self.node.nodeid] = (self.node, self._staged_deletes, self._staged_adds)
+        self._staged_deletes, self._staged_adds = [], []
+
+    def staged_count(self):
+        """
+        number of staged reference edits of all nodes
+        """
+        count = len(self._staged_deletes) + len(self._staged_adds)
+        return count + sum(len(deletes) + len(adds) for _, deletes, adds in self._stashed.values())
+
+    def _staged_changed(self):
+        count = self.staged_count()
+        self.commitAction.setText("Commit Staged Edits ({})".format(count) if count else "Commit Staged Edits")
+        self.commitAction.setEnabled(bool(count))
+        self.discardAction.setEnabled(bool(count))
+        self.staged_count_changed.emit(count)
+
     def _make_default_ref(self):
         #FIXME: remeber last choosen values or use values that make sense
         ref = ua.ReferenceDescription()
@@ -77,86 +333,333 @@ class RefsWidget(QObject):
     def add_ref(self):
         ref = self._make_default_ref()
         logger.info("Adding ref: %s", ref)
-        self._add_ref_row(ref)
+        self.model.append_refs([ref])
         idx = self.model.index(self.model.rowCount() - 1, 0)
         self.view.setCurrentIndex(idx)
         #self.view.edit(idx)
 
     @trycatchslot
     def reload(self):
-        node = self.node
-        self.clear()
-        self.show_refs(node)
+        self.show_refs(self.node)
 
     @trycatchslot
     def remove_ref(self):
-        idx = self.view.currentIndex()
-        if not idx.isValid():
+        """
+        remove references of all selected rows with one DeleteReferences request
+        """
+        rows = {idx.row() for idx in self.view.selectionModel().selectedIndexes()}
+        if not rows and self.view.currentIndex().isValid():
+            rows = {self.view.currentIndex().row()}
+        if not rows:
             logger.warning("No valid reference selected to remove")
-        idx = idx.sibling(idx.row(), 0)
-        item = self.model.itemFromIndex(idx)
-        ref = item.data(Qt.UserRole)
-        self.do_remove_ref(ref)
+            return
+        rows = sorted(rows, reverse=True)
+        refs = [self.model.data(self.model.index(row, 0), Qt.UserRole) for row in rows]
+        if self.staging:
+            for ref in refs:
+                self.stage_remove(ref)
+            for row in rows:
+                self.model.removeRow(row)
+            self._staged_changed()
+            return
+        to_remove = [(row, ref) for row, ref in zip(rows, refs) if _is_complete(ref)]
+        results = self.do_remove_refs([ref for _, ref in to_remove])
+        status = {row: result for (row, _), result in zip(to_remove, results)}
+        for row in rows:
+            # rows of references not yet written only exist in the model
+            if row not in status or status[row].is_good():
+                self.model.removeRow(row)
+        self.schedule_verification()
+        for result in results:
+            result.check()
+
+    def replace_ref(self, idx, old, ref):
+        """
+        replace reference old by ref, which is the edited reference of row idx
+        """
+        self._update_target(ref)
+        self.model.setData(idx.sibling(idx.row(), 0), ref, Qt.UserRole)
+        if self.staging:
+            if not self._is_staged_add(ref):
+                self.stage_remove(old)
+                if _is_complete(ref):
+                    self._staged_adds.append(ref)
+            self.model.set_ref_state(ref, PENDING_COLOR, "Staged")
+            self._staged_changed()
+            return
+        if _is_complete(old):
+            self.do_remove_refs([old])
+        if not _is_complete(ref):
+            logger.info("Do not save yet. Need NodeId and ReferenceTypeId to be set")
+            return
+        self.do_add_refs([ref])[0].check()
+        self.reference_changed.emit(self.node)
+        self.schedule_verification()
+
+    def show_details(self, show):
+        """
+        show or hide DisplayName and NodeClass of targets
+        """
+        for column in DETAIL_COLUMNS:
+            self.view.setColumnHidden(column, not show)
+
+    def _update_target(self, ref):
+        # target may have changed, its names and class are read once and cached
+        if not ref.NodeId.is_null():
+            bname, dname = name_cache.get_names(self.node, ref.NodeId)
+            if bname is not None:
+                ref.BrowseName = bname
+            if dname is not None:
+                ref.DisplayName = dname
+            ref.NodeClass = name_cache.get_node_class(self.node, ref.NodeId)
+
+    def set_staging(self, staging):
+        self.staging = staging
+        self.stageAction.setChecked(staging)
+        if staging:
+            # browsing again must not happen between staged edits
+            self._verify_timer.stop()
+        else:
+            self.commit_staged()
+
+    def _is_staged_add(self, ref):
+        return any(staged is ref for staged in self._staged_adds)
+
+    def stage_remove(self, ref):
+        """
+        stage removal of ref, removing a staged reference only unstages it
+        """
+        if self._is_staged_add(ref):
+            self._staged_adds = [staged for staged in self._staged_adds if staged is not ref]
+        elif _is_complete(ref):
+            self._staged_deletes.append(copy.copy(ref))
+
+    @trycatchslot
+    def commit_staged(self):
+        """
+        send staged removals of all nodes in one DeleteReferences request and staged
+        additions in one AddReferences request. If one of them fails, the successful
+        ones are undone and the references are browsed again.
+        return StatusCodes of removals and additions
+        """
+        deletes = [(self.node, ref) for ref in self._staged_deletes]
+        adds = [(self.node, ref) for ref in self._staged_adds]
+        for node, node_deletes, node_adds in self._stashed.values():
+            deletes.extend((node, ref) for ref in node_deletes)
+            adds.extend((node, ref) for ref in node_adds)
+        self._staged_deletes, self._staged_adds = [], []
+        self._stashed = {}
+        self.model.hidden = []
+        if not deletes and not adds:
+            return [], []
+        self._staged_changed()
+        logger.info("Committing %s reference removals and %s additions", len(deletes), len(adds))
+        del_results = self._remove_refs(deletes) if deletes else []
+        add_results = self._add_refs(adds) if adds else []
+        for (_, ref), status in zip(adds, add_results):
+            self.model.set_ref_state(ref, GOOD_COLOR if status.is_good() else BAD_COLOR, status.name)
+        failed = [status for status in del_results + add_results if not status.is_good()]
+        if failed:
+            logger.warning("%s of %s reference edits failed, rolling back", len(failed), len(deletes) + len(adds))
+            self._rollback([pair for pair, status in zip(deletes, del_results) if status.is_good()],
+                           [pair for pair, status in zip(adds, add_results) if status.is_good()])
+            self.error.emit(ua.UaStatusCodeError(failed[0].value))
+        nodes = {node.nodeid: node for node, _ in deletes + adds}
+        for node in nodes.values():
+            self.reference_changed.emit(node)
+        if failed:
+            self.reload()
+        else:
+            self.schedule_verification()
+        return del_results, add_results
+
+    def _rollback(self, deleted, added):
+        if added:
+            for (_, ref), status in zip(added, self._remove_refs(added)):
+                if not status.is_good():
+                    logger.warning("Could not roll back addition of %s: %s", ref, status)
+        if deleted:
+            for (_, ref), status in zip(deleted, self._add_refs(deleted)):
+                if not status.is_good():
+                    logger.warning("Could not roll back removal of %s: %s", ref, status)
+
+    @trycatchslot
+    def discard_staged(self):
+        """
+        forget staged reference edits of all nodes and browse again
+        """
+        self._staged_deletes, self._staged_adds = [], []
+        self._stashed = {}
+        self._staged_changed()
         self.reload()
 
+    def schedule_verification(self):
+        """
+        browse references again after verify_delay, edits done before are verified by the same browse
+        """
+        if self.verify_delay is not None:
+            self._verify_timer.start(self.verify_delay)
+
     def do_remove_ref(self, ref, check=True):
-        logger.info("Removing: %s", ref)
-        it = ua.DeleteReferencesItem()
-        it.SourceNodeId = self.node.nodeid
-        it.ReferenceTypeId = ref.ReferenceTypeId
-        it.IsForward = ref.IsForward
-        it.TargetNodeId = ref.NodeId
-        it.DeleteBidirectional = False
-        #param = ua.DeleteReferencesParameters()
-        #param.ReferencesToDelete.append(it)
-        results = self.node.server.delete_references([it])
-        logger.info("Remove result: %s", results[0])
+        results = self.do_remove_refs([ref])
         if check:
             results[0].check()
 
+    def do_remove_refs(self, refs):
+        """
+        remove references of current node with one DeleteReferences request, return StatusCodes
+        """
+        return self._remove_refs([(self.node, ref) for ref in refs])
+
+    def _remove_refs(self, pairs):
+        # pairs of source node and reference
+        if not pairs:
+            return []
+        logger.info("Removing: %s", [ref for _, ref in pairs])
+        items = []
+        for node, ref in pairs:
+            it = ua.DeleteReferencesItem()
+            it.SourceNodeId = node.nodeid
+            it.ReferenceTypeId = ref.ReferenceTypeId
+            it.IsForward = ref.IsForward
+            it.TargetNodeId = ref.NodeId
+            it.DeleteBidirectional = False
+            items.append(it)
+        results = call_service(pairs[0][0], "delete_references", items)
+        logger.info("Remove results: %s", results)
+        return results
+
+    def do_add_refs(self, refs):
+        """
+        add references to current node with one AddReferences request, return StatusCodes
+        """
+        return self._add_refs([(self.node, ref) for ref in refs])
+
+    def _add_refs(self, pairs):
+        # pairs of source node and reference
+        if not pairs:
+            return []
+        logger.info("Adding: %s", [ref for _, ref in pairs])
+        items = []
+        for node, ref in pairs:
+            it = ua.AddReferencesItem()
+            it.SourceNodeId = node.nodeid
+            it.ReferenceTypeId = ref.ReferenceTypeId
+            it.IsForward = ref.IsForward
+            it.TargetNodeId = ref.NodeId
+            it.TargetNodeClass = ref.NodeClass
+            items.append(it)
+        results = call_service(pairs[0][0], "add_references", items)
+        logger.info("Add results: %s", results)
+        return results
+
+    def set_filter(self, reference_type=ua.ObjectIds.References, include_subtypes=True, direction=ua.BrowseDirection.Forward, nodeclass_mask=ua.NodeClass.Unspecified):
+        """
+        only show references of reference_type, and its subtypes if include_subtypes, in direction
+        whose target node class is in nodeclass_mask. Filtering is done by the server
+        """
+        self.model.reference_type = ua.NodeId(reference_type) if isinstance(reference_type, int) else reference_type
+        self.model.include_subtypes = include_subtypes
+        self.model.direction = direction
+        self.model.nodeclass_mask = nodeclass_mask
+        if self.node is not None:
+            self.reload()
+
+    @trycatchslot
+    def edit_filter(self):
+        dialog = RefsFilterDialog(self.view, self.node, self.model)
+        if dialog.exec_() == QDialog.Accepted:
+            self.set_filter(*dialog.get_filter())
+
     def save_state(self):
         self.settings.setValue("WindowState/refs_widget_state", self.view.horizontalHeader().saveState())
 
     def show_refs(self, node):
         self.clear()
         self.node = node
+        if node is None:
+            return
+        _, self._staged_deletes, self._staged_adds = self._stashed.pop(node.nodeid, (None, [], []))
+        # show the node as it will be after commit
+        self.model.hidden = list(self._staged_deletes)
         self._show_refs(node)
+        if self._staged_adds:
+            self.model.append_refs(self._staged_adds)
+            for ref in self._staged_adds:
+                self.model.set_ref_state(ref, PENDING_COLOR, "Staged")
 
     def _show_refs(self, node):
         try:
-            refs = node.get_children_descriptions(refs=ua.ObjectIds.References)
+            self.model.browse(node)
         except Exception as ex:
             self.error.emit(ex)
             raise
-        for ref in refs:
-            self._add_ref_row(ref)
 
-    def _add_ref_row(self, ref):
-        if ref.ReferenceTypeId.Identifier in ua.ObjectIdNames:
-            typename = ua.ObjectIdNames[ref.ReferenceTypeId.Identifier]
-        else:
-            typename = str(ref.ReferenceTypeId)
-        nodeid = ref.NodeId.to_string()
-        if ref.NodeId.NamespaceIndex == 0 and ref.NodeId.Identifier in ua.ObjectIdNames:
-            nodeid += ": " + ua.ObjectIdNames[ref.NodeId.Identifier]
-        if ref.TypeDefinition.Identifier in ua.ObjectIdNames:
-            typedef = ua.ObjectIdNames[ref.TypeDefinition.Identifier]
-        else:
-            typedef = ref.TypeDefinition.to_string()
-        titem = QStandardItem(typename)
-        titem.setData(ref, Qt.UserRole)
-        self.model.appendRow([
-            titem,
-            QStandardItem(nodeid),
-            QStandardItem(ref.BrowseName.to_string()),
-            QStandardItem(typedef)
-        ])
+
+class RefsFilterDialog(QDialog):
+    """
+    Edit reference type, direction and target node classes of the references to browse
+    """
+
+    def __init__(self, parent, node, model):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle("Filter References")
+        layout = QVBoxLayout(self)
+
+        hlayout = QHBoxLayout()
+        hlayout.addWidget(QLabel("Reference Type:", self))
+        startnode = new_node(node, ua.ObjectIds.ReferenceTypesFolder)
+        self.reftype_button = GetNodeButton(self, new_node(node, model.reference_type), startnode)
+        hlayout.addWidget(self.reftype_button)
+        layout.addLayout(hlayout)
+        self.subtypes_box = QCheckBox("Include Subtypes", self)
+        self.subtypes_box.setChecked(model.include_subtypes)
+        layout.addWidget(self.subtypes_box)
+
+        hlayout = QHBoxLayout()
+        hlayout.addWidget(QLabel("Direction:", self))
+        self.direction_combo = QComboBox(self)
+        for direction in ua.BrowseDirection:
+            if direction != ua.BrowseDirection.Invalid:
+                self.direction_combo.addItem(direction.name)
+        self.direction_combo.setCurrentText(model.direction.name)
+        hlayout.addWidget(self.direction_combo)
+        layout.addLayout(hlayout)
+
+        group = QGroupBox("Target Node Classes, none for all", self)
+        glayout = QVBoxLayout(group)
+        self.nodeclass_boxes = []
+        for nclass in ua.NodeClass:
+            if nclass == ua.NodeClass.Unspecified:
+                continue
+            box = QCheckBox(nclass.name, group)
+            box.setChecked(bool(model.nodeclass_mask & nclass))
+            glayout.addWidget(box)
+            self.nodeclass_boxes.append((box, nclass))
+        layout.addWidget(group)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, Qt.Horizontal, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def get_filter(self):
+        """
+        return reference type, include subtypes, direction and node class mask
+        """
+        mask = 0
+        for box, nclass in self.nodeclass_boxes:
+            if box.isChecked():
+                mask |= nclass
+        return (self.reftype_button.get_node().nodeid,
+                self.subtypes_box.isChecked(),
+                ua.BrowseDirection[self.direction_combo.currentText()],
+                mask)
 
 
 class MyDelegate(QStyledItemDelegate):
 
     error = pyqtSignal(Exception)
-    reference_changed = pyqtSignal(SyncNode)
 
     def __init__(self, parent, widget):
         QStyledItemDelegate.__init__(self, parent)
@@ -166,9 +669,7 @@ class MyDelegate(QStyledItemDelegate):
     def createEditor(self, parent, option, idx):
         if idx.column() > 1:
             return None
-        data_idx = idx.sibling(idx.row(), 0)
-        item = self._widget.model.itemFromIndex(data_idx)
-        ref = item.data(Qt.UserRole)
+        ref = self._widget.model.data(idx.sibling(idx.row(), 0), Qt.UserRole)
         if idx.column() == 1:
             node = new_node(self._widget.node, ref.NodeId)
             startnode = new_node(self._widget.node, ua.ObjectIds.RootFolder)
@@ -184,35 +685,18 @@ class MyDelegate(QStyledItemDelegate):
     def setModelData(self, editor, model, idx):
         data_idx = idx.sibling(idx.row(), 0)
         ref = model.data(data_idx, Qt.UserRole)
-        self._widget.do_remove_ref(ref, check=False)
+        old = copy.copy(ref)
         if idx.column() == 0:
             ref.ReferenceTypeId = editor.get_node().nodeid
-            model.setData(idx, ref.ReferenceTypeId.to_string(), Qt.DisplayRole)
         elif idx.column() == 1:
+            # NodeClass is set by the widget from the name cache
             ref.NodeId = editor.get_node().nodeid
-            ref.NodeClass = editor.get_node().get_node_class()
-            model.setData(idx, ref.NodeId.to_string(), Qt.DisplayRole)
-        model.setData(data_idx, ref, Qt.UserRole)
-        if ref.NodeId.is_null() or ref.ReferenceTypeId.is_null():
-            logger.info("Do not save yet. Need NodeId and ReferenceTypeId to be set")
-            return
-        self._write_ref(ref)
-
-    def _write_ref(self, ref):
-        logger.info("Writing ref %s", ref)
-        it = ua.AddReferencesItem()
-        it.SourceNodeId = self._widget.node.nodeid
-        it.ReferenceTypeId = ref.ReferenceTypeId
-        it.IsForward = ref.IsForward
-        it.TargetNodeId = ref.NodeId
-        it.TargetNodeClass = ref.NodeClass
-
-        results = self._widget.node.server.add_references([it])
-        results[0].check()
-
-        self.reference_changed.emit(self._widget.node)
-        self._widget.reload()
+        self._widget.replace_ref(data_idx, old, ref)
 
 
+def _ref_key(ref):
+    return ref.ReferenceTypeId, ref.IsForward, ref.NodeId
 
 
+def _is_complete(ref):
+    return not ref.NodeId.is_null() and not ref.ReferenceTypeId.is_null()
@@ -0,0 +1,319 @@
+"""
+Live trend of subscribed variables.
+Samples are kept in fixed size numpy ring buffers and decimated to
+the minimum and maximum of each pixel column before drawing.
+This widget requires numpy
+"""
+import logging
+import time
+from collections import deque
+
+from PyQt5.QtCore import pyqtSignal, Qt, QObject, QTimer, QLineF, QPointF
+from PyQt5.QtGui import QPainter, QColor, QPen
+from PyQt5.QtWidgets import QWidget
+
+from asyncua import ua
+
+from uawidgets.array_utils import np
+from uawidgets.node_cache import name_cache
+from uawidgets.utils import datetime_to_seconds
+
+
+logger = logging.getLogger(__name__)
+
+# number of samples kept for each variable
+DEFAULT_CAPACITY = 100000
+# seconds of history visible in the trend
+DEFAULT_TIME_SPAN = 60.0
+# milliseconds between two repaints
+DEFAULT_REFRESH_INTERVAL = 50
+
+SERIES_COLORS = [
+    QColor(31, 119, 180),
+    QColor(255, 127, 14),
+    QColor(44, 160, 44),
+    QColor(214, 39, 40),
+    QColor(148, 103, 189),
+    QColor(140, 86, 75),
+    QColor(227, 119, 194),
+    QColor(127, 127, 127),
+    QColor(188, 189, 34),
+    QColor(23, 190, 207),
+]
+
+
+class RingBuffer(object):
+    """
+    Fixed size buffer of (timestamp, value) samples, oldest samples are overwritten.
+    Timestamps are kept sorted, samples older than the last one are dropped
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.times = np.zeros(capacity, dtype="float64")
+        self.values = np.zeros(capacity, dtype="float64")
+        self._next = 0
+        self._size = 0
+        # number of samples dropped because they were out of order
+        self.dropped = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, value):
+        """
+        add a sample, return False if it is older than the last sample and was dropped
+        """
+        if self._size and timestamp < self.last_time():
+            self.dropped += 1
+            return False
+        self.times[self._next] = timestamp
+        self.values[self._next] = value
+        self._next = (self._next + 1) % len(self.times)
+        self._size = min(self._size + 1, len(self.times))
+        return True
+
+    def segments(self):
+        """
+        return times and values of all samples as at most two
+        (times, values) views of the buffers, oldest first
+        """
+        if self._size < len(self.times):
+            return [(self.times[:self._size], self.values[:self._size])]
+        if self._next == 0:
+            return [(self.times, self.values)]
+        return [(self.times[self._next:], self.values[self._next:]), (self.times[:self._next], self.values[:self._next])]
+
+    def last_time(self):
+        if not self._size:
+            return None
+        return self.times[self._next - 1]
+
+
+def decimate_min_max(times, values, start, stop, width):
+    """
+    split the samples between start and stop in width pixel columns and
+    return the column indexes and the minimum and maximum value of each non empty column.
+    times must be sorted, as in a RingBuffer.
+    NaN values are ignored unless a column only has NaN values
+    """
+    if width <= 0 or stop <= start or not len(times):
+        empty = np.empty(0)
+        return empty.astype(int), empty, empty
+    first = np.searchsorted(times, start, side="left")
+    last = np.searchsorted(times, stop, side="right")
+    times = times[first:last]
+    values = values[first:last]
+    if not len(times):
+        empty = np.empty(0)
+        return empty.astype(int), empty, empty
+    cols = ((times - start) * (width / (stop - start))).astype(int)
+    np.clip(cols, 0, width - 1, out=cols)
+    starts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+    return cols[starts], np.fmin.reduceat(values, starts), np.fmax.reduceat(values, starts)
+
+
+class _Series(object):
+    def __init__(self, node, name, color, capacity):
+        self.node = node
+        self.name = name
+        self.color = color
+        self.buffer = RingBuffer(capacity)
+        self.handle = None
+
+
+class TrendView(QWidget):
+    """
+    Paint area of a TrendWidget
+    """
+
+    def __init__(self, parent=None):
+        QWidget.__init__(self, parent)
+        self.trend = None
+        self.setMinimumSize(200, 100)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.trend is not None:
+            self.trend.paint(painter, self.rect())
+        painter.end()
+
+
+class _SubHandler(object):
+    """
+    called from the thread of the client, only queue the samples
+    """
+
+    def __init__(self, samples):
+        self.samples = samples
+
+    def datachange_notification(self, node, val, data):
+        dv = data.monitored_item.Value
+        timestamp = dv.SourceTimestamp or dv.ServerTimestamp
+        self.samples.append((node.nodeid, datetime_to_seconds(timestamp) if timestamp else time.time(), val))
+
+
+class TrendWidget(QObject):
+    """
+    Plot the values of subscribed variables over the last time_span seconds.
+    Notifications are queued and drawn every refresh_interval milliseconds,
+    each variable keeps at most capacity samples
+    """
+
+    error = pyqtSignal(Exception)
+
+    def __init__(self, view, client=None, capacity=DEFAULT_CAPACITY, time_span=DEFAULT_TIME_SPAN, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        QObject.__init__(self, view)
+        if np is None:
+            raise ImportError("TrendWidget requires numpy")
+        self.view = view
+        self.view.trend = self
+        self.client = client
+        self.capacity = capacity
+        self.time_span = time_span
+        self._series = {}
+        self._subscription = None
+        # deque append and popleft are thread safe
+        self._samples = deque()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start(refresh_interval)
+
+    def set_client(self, client):
+        """
+        set the client used to create the subscription, removes all variables
+        """
+        self.clear()
+        self.client = client
+
+    def add_node(self, node, sampling_interval=0.0):
+        """
+        subscribe to the Value of node and plot it
+        """
+        if node.nodeid in self._series:
+            return
+        color = SERIES_COLORS[len(self._series) % len(SERIES_COLORS)]
+        series = _Series(node, name_cache.get_display_name(node, node.nodeid), color, self.capacity)
+        self._series[node.nodeid] = series
+        if self.client is None:
+            # values are given with add_sample()
+            return
+        try:
+            if self._subscription is None:
+                self._subscription = self.client.create_subscription(sampling_interval or DEFAULT_REFRESH_INTERVAL, _SubHandler(self._samples))
+            series.handle = self._subscription.subscribe_data_change(node, sampling_interval=sampling_interval)
+        except Exception as ex:
+            logger.exception("Could not subscribe to %s", node)
+            del self._series[node.nodeid]
+            self.error.emit(ex)
+
+    def remove_node(self, node):
+        series = self._series.pop(node.nodeid, None)
+        if series is None or series.handle is None:
+            return
+        try:
+            self._subscription.unsubscribe(series.handle)
+        except Exception as ex:
+            logger.warning("Could not unsubscribe %s: %s", node, ex)
+
+    def clear(self):
+        for series in list(self._series.values()):
+            self.remove_node(series.node)
+        if self._subscription is not None:
+            try:
+                self._subscription.delete()
+            except Exception as ex:
+                logger.warning("Could not delete trend subscription: %s", ex)
+            self._subscription = None
+        self._samples.clear()
+        self.view.update()
+
+    def nodes(self):
+        return [series.node for series in self._series.values()]
+
+    def add_sample(self, nodeid, timestamp, value):
+        """
+        add a value of a variable, timestamp is in seconds since epoch.
+        May be called from any thread
+        """
+        self._samples.append((nodeid, timestamp, value))
+
+    def _refresh(self):
+        if self._samples:
+            self._store_samples()
+            self.view.update()
+
+    def _store_samples(self):
+        while self._samples:
+            nodeid, timestamp, value = self._samples.popleft()
+            series = self._series.get(nodeid)
+            if series is None:
+                continue
+            if isinstance(value, ua.Variant):
+                value = value.Value
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                # strings, structures, arrays: nothing to plot
+                value = float("nan")
+            if not series.buffer.append(timestamp, value):
+                logger.debug("Dropped sample of %s older than the last one", series.name)
+
+    def paint(self, painter, rect):
+        series_list = [series for series in self._series.values() if len(series.buffer)]
+        if not series_list:
+            return
+        stop = max(series.buffer.last_time() for series in series_list)
+        start = stop - self.time_span
+        width = rect.width()
+        decimated = []
+        low = high = None
+        for series in series_list:
+            parts = [decimate_min_max(times, values, start, stop, width) for times, values in series.buffer.segments()]
+            cols, mins, maxs = (np.concatenate(arrays) for arrays in zip(*parts))
+            decimated.append((series, cols, mins, maxs))
+            if len(cols) and not np.all(np.isnan(mins)):
+                smin, smax = np.nanmin(mins), np.nanmax(maxs)
+                low = smin if low is None else min(low, smin)
+                high = smax if high is None else max(high, smax)
+        if low is None:
+            return
+        if high == low:
+            high, low = high + 1, low - 1
+        scale = (rect.height() - 1) / (high - low)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        for series, cols, mins, maxs in decimated:
+            painter.setPen(QPen(series.color))
+            painter.drawLines(self._series_lines(rect, cols, mins, maxs, low, scale))
+        self._paint_legend(painter, rect, series_list, low, high)
+
+    @staticmethod
+    def _series_lines(rect, cols, mins, maxs, low, scale):
+        bottom = rect.bottom()
+        ymins = bottom - (mins - low) * scale
+        ymaxs = bottom - (maxs - low) * scale
+        lines = []
+        prev = None
+        for x, ymin, ymax in zip((cols + rect.left()).tolist(), ymins.tolist(), ymaxs.tolist()):
+            if ymin != ymin:
+                # NaN, gap in trend
+                prev = None
+                continue
+            # vertical line from min to max of the column and line from previous column
+            lines.append(QLineF(x, ymin, x, ymax))
+            if prev is not None:
+                lines.append(QLineF(prev, QPointF(x, ymin)))
+            prev = QPointF(x, ymax)
+        return lines
+
+    def _paint_legend(self, painter, rect, series_list, low, high):
+        metrics = painter.fontMetrics()
+        y = rect.top() + metrics.ascent() + 2
+        painter.setPen(QPen(Qt.black))
+        painter.drawText(rect.right() - metrics.width("{:g}".format(high)) - 2, y, "{:g}".format(high))
+        painter.drawText(rect.right() - metrics.width("{:g}".format(low)) - 2, rect.bottom() - 2, "{:g}".format(low))
+        for series in series_list:
+            painter.setPen(QPen(series.color))
+            painter.drawText(rect.left() + 4, y, series.name)
+            y += metrics.height()
@@ -1,6 +1,15 @@
 
+import bisect
 import inspect
 import logging
+import math
+import random
+from collections import deque
+from datetime import datetime, timezone
+
+from asyncua import ua
+
+from uawidgets.node_cache import operation_limits
 
 
 logger = logging.getLogger(__name__)
@@ -31,3 +40,197 @@ def trycatchslot(func):
     return wrapper
 
 
+def chunks(seq, size):
+    """
+    split seq in lists of at most size elements, size 0 means no limit
+    """
+    if not size:
+        size = max(len(seq), 1)
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def read_nodes_attributes(node, nodeids, attrs):
+    """
+    read attributes attrs of all nodeids, using as few Read requests as
+    allowed by the MaxNodesPerRead limit of the server.
+    node is any node of the session, it is used to send the requests.
+    return a list, for each nodeid, of the list of DataValues of attrs
+    """
+    rvs = []
+    for nodeid in nodeids:
+        for attr in attrs:
+            rv = ua.ReadValueId()
+            rv.NodeId = nodeid
+            rv.AttributeId = attr
+            rvs.append(rv)
+    limit = operation_limits.get(node, ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead)
+    results = []
+    for chunk in chunks(rvs, limit):
+        params = ua.ReadParameters()
+        params.NodesToRead = chunk
+        results.extend(node.read_params(params))
+    return [results[i:i + len(attrs)] for i in range(0, len(results), len(attrs))]
+
+
+def write_nodes_attribute(node, nodeids, attr, dv):
+    """
+    write the same DataValue dv to attribute attr of all nodeids, using as few
+    Write requests as allowed by the MaxNodesPerWrite limit of the server.
+    node is any node of the session, it is used to send the requests.
+    return the list of StatusCodes of the writes, one per nodeid
+    """
+    wvs = []
+    for nodeid in nodeids:
+        wv = ua.WriteValue()
+        wv.NodeId = nodeid
+        wv.AttributeId = attr
+        wv.Value = dv
+        wvs.append(wv)
+    limit = operation_limits.get(node, ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerWrite)
+    results = []
+    for chunk in chunks(wvs, limit):
+        params = ua.WriteParameters()
+        params.NodesToWrite = chunk
+        results.extend(node.write_params(params))
+    return results
+
+
+def call_methods(node, requests):
+    """
+    send CallMethodRequests using as few Call requests as allowed by the
+    MaxNodesPerMethodCall limit of the server.
+    node is any node of the session, it is used to send the requests.
+    return the list of CallMethodResults, one per request
+    """
+    limit = operation_limits.get(node, ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerMethodCall)
+    results = []
+    for chunk in chunks(requests, limit):
+        results.extend(call_service(node, "call", chunk))
+    return results
+
+
+def call_service(node, service, *args):
+    """
+    call a service of the session of node which SyncNode does not wrap,
+    for example call_service(node, "history_read", params)
+    """
+    return node.tloop.post(getattr(node.aio_obj.session, service)(*args))
+
+
+def datetime_to_seconds(dt):
+    """
+    return seconds since epoch of a datetime, naive datetimes are UTC as in OPC UA
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def percentile(sorted_values, pct):
+    """
+    return the pct percentile of sorted_values using the nearest rank method
+    """
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class LatencyHistogram(object):
+    """
+    Count of latencies, in seconds, in buckets whose upper bound doubles from first,
+    updated one latency at a time. The last bucket has no upper bound
+    """
+
+    def __init__(self, first=0.001, buckets=12):
+        self.bounds = [first * 2 ** idx for idx in range(buckets - 1)]
+        self.counts = [0] * buckets
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(self.bounds, latency)] += 1
+
+    def buckets(self):
+        """
+        return list of (upper bound, count), upper bound of the last bucket is None
+        """
+        return list(zip(self.bounds + [None], self.counts))
+
+
+class Reservoir(object):
+    """
+    Uniform random sample of at most size values of a stream of any length
+    """
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.values = []
+        self.count = 0
+        self._sorted = None
+
+    def add(self, value):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            idx = random.randrange(self.count)
+            if idx >= self.size:
+                return
+            self.values[idx] = value
+        self._sorted = None
+
+    def percentiles(self, pcts=(50, 95, 99)):
+        if self._sorted is None:
+            self._sorted = sorted(self.values)
+        return [percentile(self._sorted, pct) for pct in pcts]
+
+
+def latency_histogram(latencies, first=0.001, buckets=12):
+    """
+    count latencies, in seconds, in buckets whose upper bound doubles from first.
+    return list of (upper bound, count), the last bucket has no upper bound (None)
+    """
+    histogram = LatencyHistogram(first, buckets)
+    for latency in latencies:
+        histogram.add(latency)
+    return histogram.buckets()
+
+
+class LatencyStats(object):
+    """
+    Source to server and server to client latencies, in seconds,
+    of the last window DataValues of a variable
+    """
+
+    def __init__(self, window=1000):
+        self.source_server = deque(maxlen=window)
+        self.server_client = deque(maxlen=window)
+
+    @staticmethod
+    def latencies(dv, received=None):
+        """
+        return source to server and server to client latency of dv received at
+        datetime received, None for latencies whose timestamps are missing
+        """
+        source_server = server_client = None
+        if dv.ServerTimestamp is not None:
+            server = datetime_to_seconds(dv.ServerTimestamp)
+            if dv.SourceTimestamp is not None:
+                source_server = server - datetime_to_seconds(dv.SourceTimestamp)
+            if received is not None:
+                server_client = datetime_to_seconds(received) - server
+        return source_server, server_client
+
+    def add(self, dv, received=None):
+        if received is None:
+            received = datetime.now(timezone.utc)
+        source_server, server_client = self.latencies(dv, received)
+        if source_server is not None:
+            self.source_server.append(source_server)
+        if server_client is not None:
+            self.server_client.append(server_client)
+        return source_server, server_client
+
+    @staticmethod
+    def percentiles(values, pcts=(50, 95, 99)):
+        values = sorted(values)
+        return [percentile(values, pct) for pct in pcts]